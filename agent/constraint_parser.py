@@ -0,0 +1,84 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+# Precompiled patterns, all run against the lowercased query. Each is gated
+# on a literal substring check so queries without e.g. "$" or "cal" never
+# enter the regex engine.
+_BUDGET = re.compile(r'\$(\d+(?:\.\d{2})?)')
+_CALORIES = re.compile(r'(\d+)\s*cal')
+_HIGH_PROTEIN = re.compile(r'high.?protein')
+_PROTEIN_GRAMS = re.compile(r'(\d+)\s*g(?:rams?)?\s+(?:of\s+)?protein')
+_WEEK = re.compile(r'\bweek(?:ly)?\b|\b7[- ]days?\b')
+_DAY = re.compile(r'\b(?:full|whole|entire|all) day\b|\bday plan\b|\bdaily plan\b')
+# "$15 a day", "$15/day": the per-day phrase must follow the amount itself
+_PER_DAY = re.compile(r'\$\d+(?:\.\d{2})?\s*(?:/\s*|(?:per|a|each)\s+)day\b')
+
+PARSE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(query: str) -> tuple:
+    q = query.lower()
+
+    diet_type = "vegan" if "vegan" in q else ("vegetarian" if "vegetarian" in q else None)
+    meal_types = tuple(m for m in MEAL_TYPES if m in q)
+
+    budget = _BUDGET.search(q) if "$" in q else None
+    calories = _CALORIES.search(q) if "cal" in q else None
+
+    high_protein = protein_grams = None
+    if "protein" in q:
+        high_protein = _HIGH_PROTEIN.search(q)
+        protein_grams = _PROTEIN_GRAMS.search(q)
+
+    horizon = None
+    if "day" in q or "daily" in q or "week" in q:
+        if _WEEK.search(q):
+            horizon = "week"
+        elif _DAY.search(q):
+            horizon = "day"
+    per_day = budget is not None and "day" in q and _PER_DAY.search(q) is not None
+
+    return (
+        diet_type,
+        float(budget.group(1)) if budget else None,
+        int(calories.group(1)) if calories else None,
+        "high" if high_protein else None,
+        meal_types[0] if meal_types else "lunch",
+        meal_types,
+        horizon,
+        int(protein_grams.group(1)) if protein_grams else None,
+        per_day
+    )
+
+
+def parse_constraints(query: str) -> Dict[str, Any]:
+    """
+    Extract meal constraints from a natural language query.
+
+    The query is lowercased once; keywords are literal substring checks
+    and numbers come from precompiled patterns that only run when their
+    anchor text is present. Results are memoized per query string, and
+    each call gets its own dict, so callers may modify it.
+    """
+    (diet_type, max_budget, calorie_target, protein_preference, meal_type,
+     meal_types, horizon, protein_target, budget_per_day) = _parse(query)
+    return {
+        "diet_type": diet_type,
+        "max_budget": max_budget,
+        "calorie_target": calorie_target,
+        "protein_preference": protein_preference,
+        "meal_type": meal_type,
+        "meal_types": list(meal_types),
+        "horizon": horizon,
+        "protein_target": protein_target,
+        "budget_per_day": budget_per_day
+    }
+
+
+def cache_info():
+    """Hit/miss statistics of the per-query parse cache."""
+    return _parse.cache_info()
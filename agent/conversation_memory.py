@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+# Rough token estimate for budget accounting (~4 characters per token)
+CHARS_PER_TOKEN = 4
+
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ConversationMemory:
+    """
+    Bounded conversation history for one session.
+
+    Keeps at most `max_turns` turns and roughly `max_tokens` tokens. When a
+    limit is exceeded the oldest turns are evicted. With a summarizer they
+    are folded into a running summary (summarizer(previous_summary,
+    evicted_turns) -> new summary); without one they are dropped. A single
+    turn larger than the whole budget is cut down to fit.
+    """
+
+    def __init__(self, max_turns: int = 20, max_tokens: int = 2000,
+                 summarizer: Optional[Summarizer] = None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary: Optional[str] = None
+        self.evicted = 0
+        self._turns: deque = deque()
+        self._tokens = 0
+
+    def append(self, role: str, content: str) -> None:
+        max_chars = self.max_tokens * CHARS_PER_TOKEN
+        if len(content) > max_chars:
+            content = content[:max_chars]
+        tokens = estimate_tokens(content)
+        self._turns.append((role, content, tokens))
+        self._tokens += tokens
+        self._evict()
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Turns in order, preceded by the summary of evicted turns if any."""
+        history = [{"role": role, "content": content} for role, content, _ in self._turns]
+        if self.summary:
+            history.insert(0, {"role": "system", "content": f"Earlier conversation: {self.summary}"})
+        return history
+
+    def clear(self) -> None:
+        self._turns.clear()
+        self._tokens = 0
+        self.summary = None
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
+
+    def _evict(self) -> None:
+        evicted = []
+        while len(self._turns) > 1 and (
+            len(self._turns) > self.max_turns or self._tokens > self.max_tokens
+        ):
+            role, content, tokens = self._turns.popleft()
+            self._tokens -= tokens
+            evicted.append({"role": role, "content": content})
+
+        if evicted:
+            self.evicted += len(evicted)
+            if self.summarizer is not None:
+                self.summary = self.summarizer(self.summary, evicted)
+
+
+class SessionStore:
+    """
+    Per-session conversation memories with bounded total footprint.
+
+    Sessions are kept in LRU order. Once `max_sessions` are held, the least
+    recently used one is dropped, and sessions idle for longer than
+    `idle_ttl` seconds expire.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 3600.0,
+                 memory_factory: Callable[[], ConversationMemory] = ConversationMemory):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_factory = memory_factory
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (last_used, memory)
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: str) -> ConversationMemory:
+        """The session's memory, created on first use."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.pop(session_id, None)
+            memory = entry[1] if entry else self.memory_factory()
+            self._sessions[session_id] = (now, memory)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+            return memory
+
+    def peek(self, session_id: str) -> Optional[ConversationMemory]:
+        """The session's memory if it exists, without touching its LRU position."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry[1] if entry else None
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(memory) for _, memory in self._sessions.values()),
+                "tokens": sum(memory.tokens for _, memory in self._sessions.values()),
+                "expired": self.expired,
+                "evicted": self.evicted
+            }
+
+    def _expire(self, now: float) -> None:
+        # Oldest entries come first, so stop at the first live one
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
@@ -1,13 +1,99 @@
+import atexit
 import json
 import os
+import threading
+import weakref
 from datetime import datetime
 
+from agent.meal_dataset import dataset_lock
+
+# Flush buffered examples once this many are pending...
+FLUSH_BATCH_SIZE = 32
+# ...or once the oldest has waited this many seconds
+FLUSH_INTERVAL = 2.0
+
+# Live writers, flushed by one exit hook; weak so the hook keeps none alive
+_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all():
+    for writer in list(_writers):
+        writer.flush()
+
+
+class BufferedDatasetWriter:
+    """
+    Batched, multi-process safe appends of JSON-lines records.
+
+    Records are serialized into an in-memory buffer and written in batches
+    when batch_size records are pending or flush_interval seconds after the
+    first one arrived. Each batch is one write under the exclusive dataset
+    lock (shared with meal_dataset.compact), followed by one fsync, so
+    concurrent writers never interleave partial lines and no batch is
+    appended to a file that compaction is about to replace. Pending
+    records of writers still alive are flushed at exit.
+    """
+
+    def __init__(self, path, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self.batches_written = 0
+        self.records_written = 0
+        _writers.add(self)
+
+    def append(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+            elif self._timer is None and self.flush_interval is not None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write all pending records now; returns how many were written."""
+        with self._lock:
+            return self._flush_locked()
+
+    def close(self):
+        self.flush()
+        _writers.discard(self)
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return 0
+        
+        data = "".join(self._pending).encode("utf-8")
+        with dataset_lock(self.path), open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        count = len(self._pending)
+        self._pending = []
+        self.batches_written += 1
+        self.records_written += count
+        return count
+
+
 class FeedbackAgent:
     """
     Agent responsible for processing user feedback and updating datasets.
     """
-    def __init__(self, dataset_path="datasets/meal_reasoning_train.jsonl"):
+    def __init__(self, dataset_path="datasets/meal_reasoning_train.jsonl",
+                 batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
         self.dataset_path = dataset_path
+        self.writer = BufferedDatasetWriter(dataset_path, batch_size, flush_interval)
 
     def process_feedback(self, feedback_data):
         """
@@ -20,7 +106,8 @@ class FeedbackAgent:
         if feedback_data.get('rating', 0) >= 4:
             new_entry = self._format_as_training_example(feedback_data)
             self._append_to_dataset(new_entry)
-            return {"status": "updated_dataset", "action": "added_positive_example"}
+            # Written with the next batch, not yet on disk
+            return {"status": "queued", "action": "added_positive_example"}
         
         # If feedback is negative, we might need a different strategy (e.g. RLHF correction),
         # for now we just log it.
@@ -41,10 +128,13 @@ class FeedbackAgent:
         }
 
     def _append_to_dataset(self, entry):
-        """Append line to jsonl file."""
-        with open(self.dataset_path, "a") as f:
-            f.write(json.dumps(entry) + "\n")
-        print(f"Appended new example to {self.dataset_path}")
+        """Queue a line for the jsonl file (written in batches)."""
+        self.writer.append(entry)
+        print(f"Queued new example for {self.dataset_path}")
+
+    def flush(self):
+        """Write any queued examples to the dataset now."""
+        return self.writer.flush()
 
 if __name__ == "__main__":
     # Test run
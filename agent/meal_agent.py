@@ -1,16 +1,15 @@
 from typing import Optional, List, Dict, Any
 import json
-import re
-from dataclasses import dataclass
 from enum import Enum
 
-@dataclass
-class MealRecommendation:
-    meal_name: str
-    calories: int
-    protein: int
-    budget: float
-    dietary_tags: List[str]
+import numpy as np
+
+from agent.constraint_parser import parse_constraints
+from agent.conversation_memory import SessionStore
+from agent.meal_catalog import MealCatalog, MealRecommendation, DEFAULT_CATALOG_PATH
+from agent.meal_index import MealIndex, top_k_by_value
+from agent.meal_plan_optimizer import MealPlanOptimizer, PlanTargets, DEFAULT_SLOTS
+from agent.tracing import tracer
 
 class MealPlanningAgent:
     """Agentic AI system for intelligent meal planning."""
@@ -22,136 +21,144 @@ class MealPlanningAgent:
         "check_dietary_restrictions": "Verify meal matches dietary needs"
     }
     
-    def __init__(self, llm_model_path: str):
-        """Initialize agent with GRPO-trained model."""
+    DEFAULT_SESSION = "default"
+    
+    def __init__(self, llm_model_path: str, catalog_path: str = DEFAULT_CATALOG_PATH,
+                 num_alternatives: int = 3, value_weights=None,
+                 sessions: Optional[SessionStore] = None):
+        """
+        Initialize agent with GRPO-trained model.
+        
+        Args:
+            num_alternatives: Ranked runner-up meals returned with each recommendation
+            value_weights: Weights per nutrition column for the value score, or a
+                vectorized function (catalog, positions) -> scores
+            sessions: Per-session conversation memory; bounded by turns, tokens
+                and session count (defaults to SessionStore())
+        """
         self.model_path = llm_model_path
-        self.conversation_history = []
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.num_alternatives = num_alternatives
+        self.value_weights = value_weights
+        self.catalog_path = catalog_path
         self.meal_database = self._load_meal_db()
+        self.meal_index = MealIndex(self.meal_database)
+        self.plan_optimizer = MealPlanOptimizer(self.meal_database, self.meal_index)
     
-    def _load_meal_db(self) -> Dict[str, MealRecommendation]:
-        """Load meal database."""
-        return {
-            "greek_yogurt_parfait": MealRecommendation(
-                meal_name="Greek Yogurt Parfait with Berries",
-                calories=395,
-                protein=12,
-                budget=4.50,
-                dietary_tags=["vegetarian", "gluten-free", "high-protein"]
-            ),
-            "chicken_quinoa": MealRecommendation(
-                meal_name="Grilled Chicken with Quinoa & Broccoli",
-                calories=595,
-                protein=45,
-                budget=7.50,
-                dietary_tags=["high-protein", "low-carb"]
-            ),
-            # Add more meals...
-        }
+    def _load_meal_db(self) -> MealCatalog:
+        """Load meal database (JSONL, CSV or compiled .npz catalog)."""
+        return MealCatalog.load(self.catalog_path)
+    
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """History of the default session."""
+        memory = self.sessions.peek(self.DEFAULT_SESSION)
+        return memory.messages() if memory else []
     
-    def plan_meal(self, user_query: str) -> Dict[str, Any]:
+    def plan_meal(self, user_query: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
         """
         Agent workflow: Parse user request → Use tools → Generate recommendation.
         
         Args:
             user_query: Natural language meal request
+            session_id: Conversation the request belongs to
         
         Returns:
             Structured meal plan with reasoning
         """
+        with tracer.span("plan_meal", session=session_id) as span:
+            # Step 1: Parse user constraints
+            with tracer.span("parse_constraints"):
+                constraints = self._parse_constraints(user_query)
+            history = self.sessions.get(session_id)
+            history.append("user", user_query)
+            
+            # Step 2: Use tools to find best meals
+            with tracer.span("get_meal_options") as step:
+                candidates = self._tool_get_meal_options(constraints)
+                step["candidates"] = len(candidates)
+            
+            # Step 3: Optimize based on budget and nutrition
+            with tracer.span("optimize_budget"):
+                ranked = self._tool_optimize_budget(candidates, constraints)
+            optimized = ranked[0] if ranked else None
+            
+            # Step 4: Verify dietary restrictions
+            verified = self._tool_check_dietary_restrictions(optimized, constraints)
+            
+            # Step 5: Format response
+            response = self._format_recommendation(verified, constraints)
+            response["alternatives"] = ranked[1:]
+            
+            history.append("assistant", response["formatted"])
+            span["found"] = verified is not None
         
-        # Step 1: Parse user constraints
-        constraints = self._parse_constraints(user_query)
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_query
-        })
+        return response
+    
+    def plan_meals(self, user_query: str, time_budget: float = 0.25,
+                   session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        """
+        Agent workflow for multi-meal plans: a full day or a week of meals.
         
-        # Step 2: Use tools to find best meals
-        candidates = self._tool_get_meal_options(constraints)
+        Slots come from the meal types mentioned in the query (breakfast,
+        lunch and dinner by default); the calorie and protein targets are
+        daily totals, and the budget covers the whole plan unless the query
+        says it is per day.
         
-        # Step 3: Optimize based on budget and nutrition
-        optimized = self._tool_optimize_budget(candidates, constraints)
+        Args:
+            user_query: Natural language plan request
+            time_budget: Seconds the optimizer may search before returning
+                its best plan so far
+            session_id: Conversation the request belongs to
         
-        # Step 4: Verify dietary restrictions
-        verified = self._tool_check_dietary_restrictions(optimized, constraints)
+        Returns:
+            Structured multi-day plan with reasoning
+        """
+        constraints = self._parse_constraints(user_query)
+        history = self.sessions.get(session_id)
+        history.append("user", user_query)
+        
+        days = 7 if constraints["horizon"] == "week" else 1
+        slots = constraints["meal_types"] or DEFAULT_SLOTS
+        budget = constraints["max_budget"]
+        if budget and not constraints["budget_per_day"]:
+            budget = budget / days
+        targets = PlanTargets(
+            calories=constraints["calorie_target"] or PlanTargets.calories,
+            protein=constraints["protein_target"] or PlanTargets.protein,
+            budget=budget or None
+        )
         
-        # Step 5: Format response
-        response = self._format_recommendation(verified, constraints)
+        result = self.plan_optimizer.plan(slots, days, targets, constraints["diet_type"], time_budget)
+        response = self._format_plan(result, constraints)
         
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response["formatted"]
-        })
+        history.append("assistant", response["formatted"])
         
         return response
     
     def _parse_constraints(self, query: str) -> Dict[str, Any]:
         """Extract meal constraints from natural language."""
-        constraints = {
-            "diet_type": None,
-            "max_budget": None,
-            "calorie_target": None,
-            "protein_preference": None,
-            "meal_type": "lunch"  # default
-        }
-        
-        # Simple regex patterns
-        if "vegetarian" in query.lower():
-            constraints["diet_type"] = "vegetarian"
-        if "vegan" in query.lower():
-            constraints["diet_type"] = "vegan"
-        if "high.?protein" in query.lower():
-            constraints["protein_preference"] = "high"
-        
-        budget_match = re.search(r'\$(\d+(?:\.\d{2})?)', query)
-        if budget_match:
-            constraints["max_budget"] = float(budget_match.group(1))
-        
-        cal_match = re.search(r'(\d+)\s*cal', query.lower())
-        if cal_match:
-            constraints["calorie_target"] = int(cal_match.group(1))
-        
-        for meal_type in ["breakfast", "lunch", "dinner", "snack"]:
-            if meal_type in query.lower():
-                constraints["meal_type"] = meal_type
-                break
-        
-        return constraints
-    
-    def _tool_get_meal_options(self, constraints: Dict) -> List[MealRecommendation]:
-        """Tool: Get meal options matching constraints."""
-        options = []
-        for meal in self.meal_database.values():
-            # Check dietary restrictions
-            if constraints["diet_type"] and constraints["diet_type"] not in meal.dietary_tags:
-                continue
-            
-            # Check budget
-            if constraints["max_budget"] and meal.budget > constraints["max_budget"]:
-                continue
-            
-            # Check calorie target (within 20% range)
-            if constraints["calorie_target"]:
-                target = constraints["calorie_target"]
-                if not (target * 0.8 <= meal.calories <= target * 1.2):
-                    continue
-            
-            options.append(meal)
-        
-        return options
+        return parse_constraints(query)
     
-    def _tool_optimize_budget(self, options: List[MealRecommendation], 
-                             constraints: Dict) -> MealRecommendation:
-        """Tool: Find meal with best value (nutrition per dollar)."""
-        if not options:
-            return None
-        
-        # Calculate nutrition density
-        best_meal = max(
-            options,
-            key=lambda m: (m.protein + m.calories/100) / m.budget if m.budget > 0 else 0
+    def _tool_get_meal_options(self, constraints: Dict) -> np.ndarray:
+        """Tool: Get catalog positions of meal options matching constraints."""
+        # Diet tag, budget and calorie window (within 20%) via the meal index
+        return self.meal_index.query(
+            diet_type=constraints["diet_type"],
+            max_budget=constraints["max_budget"],
+            calorie_target=constraints["calorie_target"]
         )
-        return best_meal
+    
+    def _tool_optimize_budget(self, options: np.ndarray,
+                             constraints: Dict) -> List[MealRecommendation]:
+        """Tool: Rank meals by value (nutrition per dollar), best first."""
+        if len(options) == 0:
+            return []
+        
+        # Score every candidate at once and keep the best few
+        best = top_k_by_value(self.meal_database, options, 1 + self.num_alternatives,
+                              self.value_weights)
+        return self.meal_index.select(best)
     
     def _tool_check_dietary_restrictions(self, meal: MealRecommendation,
                                         constraints: Dict) -> MealRecommendation:
@@ -166,6 +173,42 @@ class MealPlanningAgent:
         
         return meal
     
+    def _format_plan(self, result: Dict[str, Any], constraints: Dict) -> Dict[str, Any]:
+        """Format a multi-day plan from the optimizer's catalog positions."""
+        if not result["days"] or any(day is None for day in result["days"]):
+            return {
+                "formatted": "I couldn't build a full plan matching your criteria. Try adjusting your budget or dietary preferences.",
+                "plan": None,
+                "complete": result["complete"]
+            }
+        
+        plan = []
+        lines = []
+        for number, (day, totals) in enumerate(zip(result["days"], result["totals"]), start=1):
+            meals = {slot: self.meal_database.meal(pos) for slot, pos in day.items()}
+            plan.append({"day": number, "meals": meals, "totals": totals})
+            
+            lines.append(f"**Day {number}**")
+            for slot, meal in meals.items():
+                lines.append(f"- {slot.capitalize()}: {meal.meal_name} "
+                             f"({meal.calories} cal, {meal.protein}g protein, ${meal.budget:.2f})")
+            lines.append(f"Totals: {totals['calories']} cal, {totals['protein']}g protein, "
+                         f"${totals['budget']:.2f}")
+            lines.append("")
+        
+        return {
+            "formatted": "\n".join(lines).strip(),
+            "plan": plan,
+            "complete": result["complete"],
+            "reasoning": {
+                "constraints": constraints,
+                "objective": result["objective"],
+                "search_nodes": result["nodes"],
+                "elapsed_ms": result["elapsed_ms"],
+                "tools_used": ["get_meal_options", "optimize_plan"]
+            }
+        }
+    
     def _format_recommendation(self, meal: MealRecommendation,
                               constraints: Dict) -> Dict[str, str]:
         """Format final recommendation."""
@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "datasets", "meal_catalog.jsonl"
+)
+
+
+@dataclass
+class MealRecommendation:
+    __slots__ = ("meal_name", "calories", "protein", "budget", "dietary_tags")
+
+    meal_name: str
+    calories: int
+    protein: int
+    budget: float
+    dietary_tags: List[str]
+
+
+class StringColumn:
+    """Immutable column of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str]) -> "StringColumn":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, pos: int) -> str:
+        return self.blob[self.offsets[pos]:self.offsets[pos + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.blob.nbytes + self.offsets.nbytes
+
+
+class MealCatalog:
+    """
+    Columnar meal catalog.
+
+    Numeric attributes live in NumPy arrays, names and keys in packed string
+    columns, and dietary tags as interned ids in CSR layout (tag_indptr,
+    tag_ids) over a small tag vocabulary. Only meals handed back to callers
+    are materialized, as MealRecommendation objects.
+
+    Supports the read-only mapping interface of the old dict-of-meals
+    database: len(), keys(), values(), items() and lookup by key.
+    """
+
+    def __init__(self, keys: StringColumn, names: StringColumn, calories: np.ndarray,
+                 protein: np.ndarray, budget: np.ndarray, tag_vocab: List[str],
+                 tag_indptr: np.ndarray, tag_ids: np.ndarray):
+        self.keys_column = keys
+        self.names = names
+        self.calories = calories
+        self.protein = protein
+        self.budget = budget
+        self.tag_vocab = [sys.intern(tag) for tag in tag_vocab]
+        self.tag_lookup = {tag: i for i, tag in enumerate(self.tag_vocab)}
+        self.tag_indptr = tag_indptr
+        self.tag_ids = tag_ids
+        self._positions: Optional[Dict[str, int]] = None
+
+    # -- construction -------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "MealCatalog":
+        """Build from dicts with key, meal_name, calories, protein, budget, dietary_tags."""
+        keys, names, calories, protein, budget = [], [], [], [], []
+        tag_lookup: Dict[str, int] = {}
+        tag_indptr = [0]
+        tag_ids: List[int] = []
+
+        for record in records:
+            keys.append(str(record["key"]))
+            names.append(record["meal_name"])
+            calories.append(int(record["calories"]))
+            protein.append(int(record["protein"]))
+            budget.append(float(record["budget"]))
+            tags = record.get("dietary_tags") or []
+            if isinstance(tags, str):
+                tags = [t for t in tags.split(";") if t]
+            for tag in dict.fromkeys(tags):
+                tag_ids.append(tag_lookup.setdefault(tag, len(tag_lookup)))
+            tag_indptr.append(len(tag_ids))
+
+        return cls(
+            keys=StringColumn.from_strings(keys),
+            names=StringColumn.from_strings(names),
+            calories=np.array(calories, dtype=np.int32),
+            protein=np.array(protein, dtype=np.int32),
+            budget=np.array(budget, dtype=np.float64),
+            tag_vocab=list(tag_lookup),
+            tag_indptr=np.array(tag_indptr, dtype=np.int64),
+            tag_ids=np.array(tag_ids, dtype=np.int32)
+        )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH) -> "MealCatalog":
+        """
+        Load a catalog from .jsonl, .csv or a compiled .npz file.
+
+        CSV files use the JSONL field names as headers, with dietary_tags
+        separated by ';'.
+        """
+        if path.endswith(".npz"):
+            return cls._load_compiled(path)
+        with open(path, newline="" if path.endswith(".csv") else None) as f:
+            if path.endswith(".csv"):
+                return cls.from_records(csv.DictReader(f))
+            return cls.from_records(json.loads(line) for line in f if line.strip())
+
+    def save_compiled(self, path: str) -> None:
+        """Write the catalog's columns to an uncompressed .npz for fast loading."""
+        np.savez(
+            path,
+            key_blob=self.keys_column.blob, key_offsets=self.keys_column.offsets,
+            name_blob=self.names.blob, name_offsets=self.names.offsets,
+            calories=self.calories, protein=self.protein, budget=self.budget,
+            tag_vocab=np.array(self.tag_vocab, dtype=str),
+            tag_indptr=self.tag_indptr, tag_ids=self.tag_ids
+        )
+
+    @classmethod
+    def _load_compiled(cls, path: str) -> "MealCatalog":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                keys=StringColumn(data["key_blob"], data["key_offsets"]),
+                names=StringColumn(data["name_blob"], data["name_offsets"]),
+                calories=data["calories"],
+                protein=data["protein"],
+                budget=data["budget"],
+                tag_vocab=[str(tag) for tag in data["tag_vocab"]],
+                tag_indptr=data["tag_indptr"],
+                tag_ids=data["tag_ids"]
+            )
+
+    # -- access -------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.budget)
+
+    def tags_of(self, pos: int) -> List[str]:
+        ids = self.tag_ids[self.tag_indptr[pos]:self.tag_indptr[pos + 1]]
+        return [self.tag_vocab[i] for i in ids]
+
+    def meal(self, pos: int) -> MealRecommendation:
+        return MealRecommendation(
+            meal_name=self.names[pos],
+            calories=int(self.calories[pos]),
+            protein=int(self.protein[pos]),
+            budget=float(self.budget[pos]),
+            dietary_tags=self.tags_of(pos)
+        )
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.keys_column)
+
+    def values(self) -> Iterator[MealRecommendation]:
+        return (self.meal(i) for i in range(len(self)))
+
+    def items(self) -> Iterator:
+        return ((self.keys_column[i], self.meal(i)) for i in range(len(self)))
+
+    def position(self, key: str) -> int:
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.keys_column)}
+        return self._positions[key]
+
+    def __getitem__(self, key: str) -> MealRecommendation:
+        return self.meal(self.position(key))
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self.position(key)
+        except KeyError:
+            return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return (self.keys_column.nbytes + self.names.nbytes + self.calories.nbytes
+                + self.protein.nbytes + self.budget.nbytes + self.tag_indptr.nbytes
+                + self.tag_ids.nbytes)
@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import sys
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking
+    fcntl = None
+
+DEFAULT_DATASET_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "datasets", "meal_reasoning_train.jsonl"
+)
+
+# Bytes read per refill of the streaming reader
+READ_CHUNK = 1 << 16
+# A record that still fails to parse once this much text is buffered is skipped
+MAX_RECORD_BYTES = 16 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def iter_raw(path: str, errors: Optional[List[int]] = None, start: int = 0,
+             stop: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Stream (byte offset, object) for every top-level JSON object in a file.
+
+    Accepts JSON lines as well as pretty-printed objects spread over many
+    lines or concatenated back to back. Only a chunk plus the current record
+    is held in memory. Unparseable stretches are skipped up to the next
+    line that opens an object; their byte offsets are appended to `errors`
+    when a list is given. With start/stop, parsing begins at byte `start`
+    (which must open a record) and ends before the first record at or past
+    byte `stop`.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        buffer = ""
+        pos = 0   # parse position in buffer
+        mark = 0  # buffer position whose byte offset is `base`
+        base = start
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            base += len(buffer[mark:pos].encode())
+            mark = pos
+            if stop is not None and base >= stop:
+                return
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pos, eof = _refill(f, "")
+                mark = 0
+                continue
+
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Raw newlines cannot occur inside JSON strings, so a later
+                # line opening an object means this one is corrupt rather
+                # than cut off at the end of the buffer
+                skip = buffer.find("\n{", pos + 1)
+                if skip < 0 and not eof and len(buffer) - pos < MAX_RECORD_BYTES:
+                    buffer, pos, eof = _refill(f, buffer[pos:])
+                    mark = 0
+                    continue
+                if errors is not None:
+                    errors.append(base)
+                # Resynchronize on the next line that opens an object
+                pos = skip + 1 if skip >= 0 else len(buffer)
+                continue
+
+            if end == len(buffer) and not eof:
+                # A number or literal could continue in the next chunk
+                buffer, pos, eof = _refill(f, buffer[pos:])
+                mark = 0
+                continue
+
+            offset = base
+            pos = end
+            if isinstance(record, dict):
+                yield offset, record
+            elif errors is not None:
+                errors.append(offset)
+
+
+def sync_point(f, offset: int) -> int:
+    """
+    Byte offset of the first line at or after `offset` that opens an object.
+
+    Shard boundaries are moved to these points, so every reader that is
+    given the same split computes the same record boundaries. Returns the
+    file size when no such line follows.
+    """
+    if offset <= 0:
+        return 0
+    f.seek(offset - 1)
+    tail = b""
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return f.tell()
+        found = (tail + chunk).find(b"\n{")
+        if found >= 0:
+            return f.tell() - len(tail) - len(chunk) + found + 1
+        tail = chunk[-1:]
+
+
+def _refill(f, pending: str) -> Tuple[str, int, bool]:
+    """(buffer, parse position, eof) after appending the next chunk to pending text."""
+    chunk = f.read(READ_CHUNK)
+    # Keep multi-byte UTF-8 sequences whole across chunk boundaries
+    while chunk:
+        try:
+            return pending + chunk.decode("utf-8"), 0, False
+        except UnicodeDecodeError as e:
+            if e.start < len(chunk) - 3:
+                raise
+            more = f.read(1)
+            if not more:
+                raise
+            chunk += more
+    return pending, 0, True
+
+
+def normalize_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Canonical training record: {"prompt": [messages], "expected_answer": str, "metadata": {...}}.
+
+    Records already in prompt/expected_answer form pass through; chat
+    records ({"messages": [...]}, as FeedbackAgent writes them) use the
+    final assistant message as the answer and everything before it as the
+    prompt. A string prompt becomes a single user message. Returns None for
+    records that have no answer.
+    """
+    metadata = record.get("metadata") or {}
+    if "messages" in record:
+        messages = list(record["messages"])
+        if not messages or messages[-1].get("role") != "assistant":
+            return None
+        prompt, answer = messages[:-1], messages[-1].get("content")
+    else:
+        prompt, answer = record.get("prompt"), record.get("expected_answer")
+        if isinstance(prompt, str):
+            prompt = [{"role": "user", "content": prompt}]
+
+    if not prompt or not isinstance(answer, str):
+        return None
+    normalized = {"prompt": prompt, "expected_answer": answer}
+    if metadata:
+        normalized["metadata"] = metadata
+    return normalized
+
+
+def iter_records(path: str = DEFAULT_DATASET_PATH, shard: int = 0, num_shards: int = 1,
+                 errors: Optional[List[int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream normalized records, optionally one shard of them.
+
+    Shard k of n covers the k-th of n equal byte ranges of the file, with
+    both ends moved forward to the next line that opens an object, so n
+    readers with distinct k together see each record exactly once and each
+    decodes only its own part of the file. Records that do not normalize
+    are skipped (and their offsets added to `errors`).
+    """
+    if not 0 <= shard < num_shards:
+        raise ValueError(f"shard must be in [0, {num_shards}), got {shard}")
+    start, stop = 0, None
+    if num_shards > 1:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = sync_point(f, size * shard // num_shards)
+            stop = sync_point(f, size * (shard + 1) // num_shards)
+    for offset, record in iter_raw(path, errors, start, stop):
+        normalized = normalize_record(record)
+        if normalized is None:
+            if errors is not None:
+                errors.append(offset)
+            continue
+        yield normalized
+
+
+def index_path(path: str) -> str:
+    return f"{path}.idx.npy"
+
+
+def lock_path(path: str) -> str:
+    return f"{path}.lock"
+
+
+@contextmanager
+def dataset_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """
+    Hold an flock on a dataset for the duration of the block.
+
+    The lock lives on a sidecar <path>.lock file rather than the dataset
+    itself, because compact() replaces the dataset file and a lock on the
+    old inode would no longer exclude anyone. Appenders and compact() take
+    it exclusively; readers pairing the file with its index take it shared.
+    """
+    with open(lock_path(path), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _save_index(path: str, offsets: np.ndarray) -> None:
+    tmp_index = f"{path}.{os.getpid()}.tmp.idx.npy"
+    np.save(tmp_index, offsets)
+    os.replace(tmp_index, index_path(path))
+
+
+def compact(src: str, dst: str, errors: Optional[List[int]] = None) -> int:
+    """
+    Rewrite a dataset as canonical JSON lines with a byte-offset index.
+
+    The index (<dst>.idx.npy) holds the start of every line as int64, so
+    IndexedDataset can seek straight to record i. src and dst may be the
+    same file. src (and dst) stay locked from the first read until both
+    outputs are in place, so no append lands in the old file and no reader
+    pairs the new file with the old index. Returns the record count.
+    """
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    offsets = []
+    same_file = os.path.abspath(dst) == os.path.abspath(src)
+    with dataset_lock(src), (nullcontext() if same_file else dataset_lock(dst)):
+        try:
+            with open(tmp_path, "wb") as out:
+                for record in iter_records(src, errors=errors):
+                    offsets.append(out.tell())
+                    out.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                out.flush()
+                os.fsync(out.fileno())
+            # Drop the old index first: if saving the new one fails, readers
+            # rebuild it by scanning rather than trusting stale offsets
+            if os.path.exists(index_path(dst)):
+                os.remove(index_path(dst))
+            os.replace(tmp_path, dst)
+            _save_index(dst, np.array(offsets, dtype=np.int64))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return len(offsets)
+
+
+class IndexedDataset:
+    """
+    Random access over a canonical JSON-lines dataset.
+
+    Record i is read with one seek and one readline via the byte-offset
+    index written by compact(). Lines appended after the index was written
+    (by FeedbackAgent, say) are indexed on open or refresh(), scanning only
+    the new tail of the file. Records are normalized on read. The file and
+    its index are (re)opened under the shared dataset lock, and a refresh
+    after compact() replaced the file reopens both.
+    """
+
+    def __init__(self, path: str = DEFAULT_DATASET_PATH):
+        self.path = path
+        self._file = None
+        self.refresh()
+
+    def _open(self) -> None:
+        """Open the current file and its index; the caller holds the lock."""
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "rb")
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self._end = 0  # byte offset just past the last indexed line
+        if os.path.exists(index_path(self.path)):
+            self.offsets = np.load(index_path(self.path))
+            if len(self.offsets):
+                self._file.seek(int(self.offsets[-1]))
+                self._end = int(self.offsets[-1]) + len(self._file.readline())
+
+    def _replaced(self) -> bool:
+        return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+
+    def refresh(self, save: bool = True) -> int:
+        """Index lines appended since the last refresh; returns how many."""
+        with dataset_lock(self.path, shared=True):
+            if self._file is None or self._replaced():
+                self._open()
+            size = os.fstat(self._file.fileno()).st_size
+            if size < self._end:
+                raise ValueError(f"{self.path} shrank below its index; run compact() again")
+            if size == self._end:
+                return 0
+
+            new = []
+            self._file.seek(self._end)
+            pos = self._end
+            for line in self._file:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append; pick it up next time
+                if line.strip():
+                    new.append(pos)
+                pos += len(line)
+            self._end = pos
+            if new:
+                self.offsets = np.concatenate([self.offsets, np.array(new, dtype=np.int64)])
+                if save:
+                    _save_index(self.path, self.offsets)
+            return len(new)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        self._file.seek(int(self.offsets[i]))
+        return normalize_record(json.loads(self._file.readline()))
+
+    def shard(self, shard: int, num_shards: int) -> Iterator[Dict[str, Any]]:
+        """
+        Records whose lines start in the shard-th of num_shards byte ranges
+        of the indexed file (the split iter_records makes of the same bytes).
+        """
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"shard must be in [0, {num_shards}), got {shard}")
+        lo, hi = np.searchsorted(self.offsets, [self._end * shard // num_shards,
+                                                self._end * (shard + 1) // num_shards])
+        for i in range(lo, hi):
+            yield self[i]
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "IndexedDataset":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Meal reasoning dataset tools")
+    parser.add_argument("command", choices=["compact", "stats"])
+    parser.add_argument("--input", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--output", help="Compacted dataset path (defaults to rewriting --input)")
+    args = parser.parse_args()
+
+    skipped: List[int] = []
+    if args.command == "compact":
+        count = compact(args.input, args.output or args.input, skipped)
+        print(f"Wrote {count} records to {args.output or args.input} ({len(skipped)} skipped)")
+    else:
+        count = sum(1 for _ in iter_records(args.input, errors=skipped))
+        print(f"{count} records, {len(skipped)} unreadable or incomplete")
+    sys.exit(0)
@@ -0,0 +1,143 @@
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from agent.meal_catalog import MealCatalog, MealRecommendation
+
+# Calorie targets match meals within this fraction either side
+CALORIE_TOLERANCE = 0.2
+
+# Default value score: (protein + calories / 100) per dollar
+DEFAULT_VALUE_WEIGHTS = {"protein": 1.0, "calories": 0.01}
+
+ValueFn = Callable[[MealCatalog, np.ndarray], np.ndarray]
+
+
+def nutrition_per_dollar(catalog: MealCatalog, positions: np.ndarray,
+                         weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Weighted sum of nutrition columns divided by budget, for many meals at once.
+
+    Meals without a positive budget score 0.
+    """
+    weights = DEFAULT_VALUE_WEIGHTS if weights is None else weights
+    nutrition = np.zeros(len(positions), dtype=np.float64)
+    for column, weight in weights.items():
+        nutrition += weight * getattr(catalog, column)[positions]
+    budget = catalog.budget[positions]
+    values = np.zeros(len(positions), dtype=np.float64)
+    np.divide(nutrition, budget, out=values, where=budget > 0)
+    return values
+
+
+def top_k_by_value(catalog: MealCatalog, positions: np.ndarray, k: int,
+                   value: Union[Dict[str, float], ValueFn, None] = None) -> np.ndarray:
+    """
+    The k best-value positions, best first; ties keep catalog order.
+
+    value is either a weights dict for nutrition_per_dollar or a vectorized
+    function (catalog, positions) -> scores. Only the k best are sorted: the
+    k-th best score is found with a partition, and just the meals at least
+    that good go through the final sort.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    if k <= 0 or len(positions) == 0:
+        return positions[:0]
+
+    if callable(value):
+        scores = np.asarray(value(catalog, positions), dtype=np.float64)
+    else:
+        scores = nutrition_per_dollar(catalog, positions, value)
+
+    if k < len(positions):
+        kth_best = np.partition(-scores, k - 1)[k - 1]
+        shortlist = np.flatnonzero(-scores <= kth_best)
+    else:
+        shortlist = np.arange(len(positions))
+
+    order = np.lexsort((positions[shortlist], -scores[shortlist]))
+    return positions[shortlist[order[:k]]]
+
+
+class MealIndex:
+    """
+    Secondary indexes over a columnar meal catalog for constraint queries.
+
+    Keeps a sorted posting array per dietary tag and the catalog's positions
+    sorted by budget and by calories, so each constraint resolves to a
+    candidate slice via lookup or searchsorted. A query starts from the
+    most selective candidate array and applies the remaining constraints to
+    it as vectorized masks, so its cost scales with the smallest match set
+    instead of the catalog size.
+    """
+
+    def __init__(self, catalog: MealCatalog):
+        self.catalog = catalog
+
+        owners = np.repeat(np.arange(len(catalog), dtype=np.int64), np.diff(catalog.tag_indptr))
+        order = np.argsort(catalog.tag_ids, kind="stable")
+        boundaries = np.searchsorted(catalog.tag_ids[order], np.arange(len(catalog.tag_vocab) + 1))
+        self._tag_postings = {
+            tag: owners[order[boundaries[i]:boundaries[i + 1]]]
+            for i, tag in enumerate(catalog.tag_vocab)
+        }
+
+        self._by_budget = np.argsort(catalog.budget, kind="stable")
+        self._budget_keys = catalog.budget[self._by_budget]
+        self._by_calories = np.argsort(catalog.calories, kind="stable")
+        self._calorie_keys = catalog.calories[self._by_calories]
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def query(self, diet_type: Optional[str] = None, max_budget: Optional[float] = None,
+              calorie_target: Optional[int] = None) -> np.ndarray:
+        """
+        Positions of meals matching every given constraint, in catalog order.
+
+        Falsy constraints are ignored, as in the original linear scan.
+        """
+        candidates = []  # candidate positions, one array per active constraint
+        postings = None
+
+        if diet_type:
+            postings = self._tag_postings.get(diet_type)
+            if postings is None:
+                return np.empty(0, dtype=np.int64)
+            candidates.append(postings)
+
+        if max_budget:
+            end = np.searchsorted(self._budget_keys, max_budget, side="right")
+            candidates.append(self._by_budget[:end])
+
+        if calorie_target:
+            low = calorie_target * (1 - CALORIE_TOLERANCE)
+            high = calorie_target * (1 + CALORIE_TOLERANCE)
+            start = np.searchsorted(self._calorie_keys, low, side="left")
+            end = np.searchsorted(self._calorie_keys, high, side="right")
+            candidates.append(self._by_calories[start:end])
+
+        if not candidates:
+            return np.arange(len(self.catalog), dtype=np.int64)
+
+        matches = min(candidates, key=len)
+        catalog = self.catalog
+        keep = np.ones(len(matches), dtype=bool)
+
+        if postings is not None and matches is not postings:
+            slots = np.minimum(np.searchsorted(postings, matches), len(postings) - 1)
+            keep &= postings[slots] == matches
+        if max_budget:
+            keep &= catalog.budget[matches] <= max_budget
+        if calorie_target:
+            calories = catalog.calories[matches]
+            keep &= (low <= calories) & (calories <= high)
+
+        return np.sort(matches[keep])
+
+    def tagged(self, tag: str) -> Optional[np.ndarray]:
+        """Sorted positions of meals carrying a tag, or None if no meal has it."""
+        return self._tag_postings.get(tag)
+
+    def select(self, positions: Iterable[int]) -> List[MealRecommendation]:
+        return [self.catalog.meal(int(pos)) for pos in positions]
@@ -0,0 +1,206 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from agent.meal_catalog import MealCatalog
+from agent.meal_index import MealIndex
+
+# Share of the daily calorie target each slot aims for (renormalized over the requested slots)
+SLOT_CALORIE_SHARE = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.35, "snack": 0.10}
+DEFAULT_SLOTS = ["breakfast", "lunch", "dinner"]
+
+# Budget used to scale the price term when the user gave none
+REFERENCE_DAILY_BUDGET = 30.0
+
+
+@dataclass
+class PlanTargets:
+    """Daily goals for a multi-meal plan."""
+    calories: float = 2000.0
+    protein: float = 50.0
+    budget: Optional[float] = None  # hard cap per day
+
+
+class MealPlanOptimizer:
+    """
+    Picks one meal per slot for each day of a plan.
+
+    Each day is solved by depth-first branch-and-bound over per-slot
+    shortlists. A day's cost is its relative calorie miss, plus any protein
+    shortfall, plus a small price term and a penalty for repeating meals.
+    The per-day budget is a hard cap. Shortlists are the `shortlist_size`
+    meals closest to each slot's calorie share, picked with a vectorized
+    partition over the catalog, so search cost does not grow with catalog
+    size. The search is anytime: when the time budget runs out the best
+    plan found so far is returned and marked incomplete.
+
+    Slots are matched to meals tagged with the slot name (e.g. "breakfast")
+    when the catalog has such tags, otherwise every meal is eligible.
+    """
+
+    def __init__(self, catalog: MealCatalog, index: MealIndex, shortlist_size: int = 40,
+                 price_weight: float = 0.1, repeat_weight: float = 0.5):
+        self.catalog = catalog
+        self.index = index
+        self.shortlist_size = shortlist_size
+        self.price_weight = price_weight
+        self.repeat_weight = repeat_weight
+
+    def plan(self, slots: Optional[List[str]] = None, days: int = 1,
+             targets: Optional[PlanTargets] = None, diet_type: Optional[str] = None,
+             time_budget: float = 0.25) -> Dict:
+        """
+        Plan `days` days of `slots` meals.
+
+        Returns:
+            Dict with "days" (one {slot: catalog position} dict per day, or
+            None for a day with no feasible plan), per-day "totals", the
+            summed "objective", "complete" (False if any day hit the time
+            budget) and search statistics.
+        """
+        slots = slots or DEFAULT_SLOTS
+        targets = targets or PlanTargets()
+        start = time.perf_counter()
+        deadline = start + time_budget
+        shortlists = [self._shortlist(slot, slots, targets, diet_type) for slot in slots]
+
+        used: Dict[int, int] = {}
+        plan_days, totals = [], []
+        objective = 0.0
+        complete = True
+        nodes = 0
+
+        for day in range(days):
+            # Share what is left of the time budget evenly over the remaining days
+            now = time.perf_counter()
+            day_deadline = now + max(deadline - now, 0.0) / (days - day)
+            chosen, cost, day_complete, day_nodes = self._plan_day(shortlists, targets, used, day_deadline)
+            nodes += day_nodes
+            complete &= day_complete
+
+            if chosen is None:
+                plan_days.append(None)
+                totals.append(None)
+                continue
+
+            for pos in chosen:
+                used[pos] = used.get(pos, 0) + 1
+            plan_days.append(dict(zip(slots, chosen)))
+            totals.append(self._totals(chosen))
+            objective += cost
+
+        return {
+            "days": plan_days,
+            "totals": totals,
+            "objective": round(objective, 4),
+            "complete": complete,
+            "nodes": nodes,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def _shortlist(self, slot: str, slots: List[str], targets: PlanTargets,
+                   diet_type: Optional[str]) -> np.ndarray:
+        """Meals for one slot, closest to the slot's calorie share first."""
+        catalog = self.catalog
+        candidates = self.index.query(diet_type=diet_type, max_budget=targets.budget)
+        slot_meals = self.index.tagged(slot)
+        if slot_meals is not None:
+            candidates = np.intersect1d(candidates, slot_meals, assume_unique=True)
+        if len(candidates) == 0:
+            return candidates
+
+        total_share = sum(SLOT_CALORIE_SHARE.get(s, 0.25) for s in slots)
+        slot_calories = targets.calories * SLOT_CALORIE_SHARE.get(slot, 0.25) / total_share
+        price_ref = targets.budget or REFERENCE_DAILY_BUDGET
+
+        score = np.abs(catalog.calories[candidates] - slot_calories) / targets.calories
+        score += self.price_weight * catalog.budget[candidates] / price_ref
+        score -= np.minimum(catalog.protein[candidates] / targets.protein, 1.0) / len(slots)
+
+        if len(candidates) > self.shortlist_size:
+            keep = np.argpartition(score, self.shortlist_size - 1)[:self.shortlist_size]
+            candidates, score = candidates[keep], score[keep]
+        return candidates[np.argsort(score, kind="stable")]
+
+    def _plan_day(self, shortlists: List[np.ndarray], targets: PlanTargets,
+                  used: Dict[int, int], deadline: float):
+        if any(len(s) == 0 for s in shortlists):
+            return None, float("inf"), True, 0
+
+        catalog = self.catalog
+        n_slots = len(shortlists)
+        positions = [s.tolist() for s in shortlists]
+        calories = [catalog.calories[s].astype(float).tolist() for s in shortlists]
+        protein = [catalog.protein[s].astype(float).tolist() for s in shortlists]
+        price = [catalog.budget[s].tolist() for s in shortlists]
+
+        # Bounds on what the slots after i can still contribute
+        min_cal, max_cal, max_prot, min_price = ([0.0] * (n_slots + 1) for _ in range(4))
+        for i in range(n_slots - 1, -1, -1):
+            min_cal[i] = min_cal[i + 1] + min(calories[i])
+            max_cal[i] = max_cal[i + 1] + max(calories[i])
+            max_prot[i] = max_prot[i + 1] + max(protein[i])
+            min_price[i] = min_price[i + 1] + min(price[i])
+
+        cal_target, prot_target, budget = targets.calories, targets.protein, targets.budget
+        price_scale = self.price_weight / (budget or REFERENCE_DAILY_BUDGET)
+        repeat_weight = self.repeat_weight
+
+        def lower_bound(i, cal_sum, prot_sum, price_sum):
+            need = cal_target - cal_sum
+            if need < min_cal[i]:
+                cal_miss = min_cal[i] - need
+            elif need > max_cal[i]:
+                cal_miss = need - max_cal[i]
+            else:
+                cal_miss = 0.0
+            prot_short = max(0.0, prot_target - prot_sum - max_prot[i])
+            return (cal_miss / cal_target + prot_short / prot_target
+                    + price_scale * (price_sum + min_price[i]))
+
+        best_cost = float("inf")
+        best_plan = None
+        chosen: List[int] = []
+        nodes = 0
+        timed_out = False
+
+        def search(i, cal_sum, prot_sum, price_sum, penalty):
+            nonlocal best_cost, best_plan, nodes, timed_out
+            for j, pos in enumerate(positions[i]):
+                nodes += 1
+                if nodes & 1023 == 0 and time.perf_counter() > deadline:
+                    timed_out = True
+                if timed_out:
+                    return
+
+                new_price = price_sum + price[i][j]
+                if budget is not None and new_price + min_price[i + 1] > budget:
+                    continue
+
+                new_cal = cal_sum + calories[i][j]
+                new_prot = prot_sum + protein[i][j]
+                new_penalty = penalty + repeat_weight * (used.get(pos, 0) + chosen.count(pos))
+                bound = lower_bound(i + 1, new_cal, new_prot, new_price) + new_penalty
+                if bound >= best_cost:
+                    continue
+
+                chosen.append(pos)
+                if i + 1 == n_slots:
+                    # At a leaf the bound is the exact cost
+                    best_cost, best_plan = bound, list(chosen)
+                else:
+                    search(i + 1, new_cal, new_prot, new_price, new_penalty)
+                chosen.pop()
+
+        search(0, 0.0, 0.0, 0.0, 0.0)
+        return best_plan, best_cost, not timed_out, nodes
+
+    def _totals(self, chosen: List[int]) -> Dict[str, float]:
+        idx = np.asarray(chosen, dtype=np.int64)
+        return {
+            "calories": int(self.catalog.calories[idx].sum()),
+            "protein": int(self.catalog.protein[idx].sum()),
+            "budget": round(float(self.catalog.budget[idx].sum()), 2)
+        }
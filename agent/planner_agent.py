@@ -1,11 +1,29 @@
 import os
+import sys
 import json
 import random
+import asyncio
+import copy
 from typing import TypedDict, Annotated, List, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 import operator
 
+from agent.planner_services import DealsService, MealDBService
+from agent.ttl_cache import AsyncTTLCache, lookup_key
+from agent.tracing import tracer, annotate, state_size, SIZE_BUCKETS
+
+# Per-node timeouts (seconds) for the I/O-bound lookups; a node that times
+# out contributes an empty result and an entry in `errors`
+DEALS_TIMEOUT = float(os.environ.get("SAPOR_DEALS_TIMEOUT", 2.0))
+DB_TIMEOUT = float(os.environ.get("SAPOR_DB_TIMEOUT", 2.0))
+
+# Lookup caches, keyed by (location, diet, budget band). Deals change slowly;
+# DB candidates a little faster.
+DEALS_CACHE_TTL = float(os.environ.get("SAPOR_DEALS_CACHE_TTL", 300.0))
+DB_CACHE_TTL = float(os.environ.get("SAPOR_DB_CACHE_TTL", 60.0))
+LOOKUP_CACHE_SIZE = int(os.environ.get("SAPOR_LOOKUP_CACHE_SIZE", 4096))
+
 # Define the Agent State
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
@@ -13,12 +31,13 @@ class AgentState(TypedDict):
     deals: List[Dict[str, Any]]
     candidates: List[Dict[str, Any]]
     final_plan: Dict[str, Any]
+    errors: Annotated[List[str], operator.add]
 
 # Mock Tools / Functions
 
 def parse_request(state: AgentState):
     """Extract constraints from the latest user message."""
-    print("--- PARSE REQUEST ---")
+    print("--- PARSE REQUEST ---", file=sys.stderr)
     last_message = state['messages'][-1].content
     # Simple mock parsing logic
     constraints = {
@@ -35,32 +54,47 @@ def parse_request(state: AgentState):
         
     return {"constraints": constraints}
 
-def find_local_deals(state: AgentState):
-    """Mock Google Maps / local api for deals."""
-    print("--- FIND DEALS ---")
-    # In reality, call Google Maps Places API here
-    mock_deals = [
-        {"place": "Green Garden", "item": "Veggie Wrap", "price": 5.0, "location": "123 Main St"},
-        {"place": "Burger Joint", "item": "Cheeseburger", "price": 6.0, "location": "456 Elm St"}
-    ]
-    return {"deals": mock_deals}
-
-def query_meal_db(state: AgentState):
-    """Mock MongoDB query."""
-    print("--- QUERY DB ---")
-    # In reality, use pymongo
-    mock_candidates = [
-        {"name": "Home Salad", "cost": 3.0, "type": "vegetarian"},
-        {"name": "Grilled Chicken", "cost": 5.0, "type": "non-vegetarian"}
-    ]
-    return {"candidates": mock_candidates}
+async def _lookup(name: str, cache: AsyncTTLCache, constraints: Dict[str, Any], loader):
+    if cache is None:
+        return await loader()
+    key = lookup_key(constraints)
+    outcome = cache.status(key)
+    annotate(cache=outcome)
+    tracer.metrics.inc("sapor_cache_lookups_total", cache=name, outcome=outcome)
+    # Cached results (lists of dicts) are shared between requests and the
+    # dicts end up in the returned plan, so each caller gets a deep copy
+    return copy.deepcopy(await cache.get_or_load(key, loader))
+
+async def find_local_deals(state: AgentState, service: DealsService, timeout: float = DEALS_TIMEOUT,
+                           cache: AsyncTTLCache = None):
+    """Look up local deals (Google Maps / local api)."""
+    print("--- FIND DEALS ---", file=sys.stderr)
+    constraints = state['constraints']
+    try:
+        deals = await asyncio.wait_for(
+            _lookup("deals", cache, constraints, lambda: service.find_deals(constraints)), timeout)
+    except asyncio.TimeoutError:
+        return {"deals": [], "errors": [f"find_deals timed out after {timeout}s"]}
+    return {"deals": deals}
+
+async def query_meal_db(state: AgentState, service: MealDBService, timeout: float = DB_TIMEOUT,
+                        cache: AsyncTTLCache = None):
+    """Query the meal database (MongoDB)."""
+    print("--- QUERY DB ---", file=sys.stderr)
+    constraints = state['constraints']
+    try:
+        candidates = await asyncio.wait_for(
+            _lookup("meal_db", cache, constraints, lambda: service.query(constraints)), timeout)
+    except asyncio.TimeoutError:
+        return {"candidates": [], "errors": [f"query_db timed out after {timeout}s"]}
+    return {"candidates": candidates}
 
 def generate_plan(state: AgentState):
     """Synthesize deals and DB candidates into a plan."""
-    print("--- GENERATE PLAN ---")
+    print("--- GENERATE PLAN ---", file=sys.stderr)
     constraints = state['constraints']
-    deals = state['deals']
-    candidates = state['candidates']
+    deals = state.get('deals') or []
+    candidates = state.get('candidates') or []
     
     plan = {
         "recommendation": "Mix of home and eating out",
@@ -70,46 +104,183 @@ def generate_plan(state: AgentState):
     # Simple logic: Pick a deal if in budget, else home meal
     if deals and deals[0]['price'] <= constraints['budget']:
         plan['meals'].append(deals[0])
-    else:
+    elif candidates:
         plan['meals'].append(candidates[0])
+    if state.get('errors'):
+        plan['errors'] = state['errors']
         
     return {
         "final_plan": plan, 
         "messages": [AIMessage(content=json.dumps(plan, indent=2))]
     }
 
+def _record_node(span: Dict[str, Any], state: AgentState, update: Dict[str, Any]):
+    span["state_in"] = state_size(state)
+    span["state_out"] = state_size(update)
+    if update.get("errors"):
+        span["errors"] = update["errors"]
+    for direction in ("in", "out"):
+        tracer.metrics.observe("sapor_node_state_bytes", span[f"state_{direction}"],
+                               buckets=SIZE_BUCKETS, node=span["span"], direction=direction)
+
+def traced_node(name: str, node):
+    """Wrap a graph node (sync or async) in a span with wall time, state sizes and errors."""
+    if asyncio.iscoroutinefunction(node):
+        async def run(state: AgentState):
+            with tracer.span(name) as span:
+                update = await node(state)
+                _record_node(span, state, update)
+            return update
+    else:
+        def run(state: AgentState):
+            with tracer.span(name) as span:
+                update = node(state)
+                _record_node(span, state, update)
+            return update
+    return run
+
 # Build the Graph
-workflow = StateGraph(AgentState)
+def build_graph(deals_service: DealsService = None, db_service: MealDBService = None,
+                deals_timeout: float = DEALS_TIMEOUT, db_timeout: float = DB_TIMEOUT,
+                deals_cache: AsyncTTLCache = None, db_cache: AsyncTTLCache = None):
+    """
+    Compile the planner graph.
+
+    find_deals and query_db are independent, so both fan out from
+    parse_request and run concurrently; generate_plan waits for both.
+    Lookups go through deals_cache / db_cache when given.
+    Run it with app.ainvoke / app.astream.
+    """
+    deals_service = deals_service or DealsService()
+    db_service = db_service or MealDBService()
+
+    async def find_deals(state: AgentState):
+        return await find_local_deals(state, deals_service, deals_timeout, deals_cache)
+
+    async def query_db(state: AgentState):
+        return await query_meal_db(state, db_service, db_timeout, db_cache)
+
+    workflow = StateGraph(AgentState)
+
+    # Add Nodes
+    workflow.add_node("parse_request", traced_node("parse_request", parse_request))
+    workflow.add_node("find_deals", traced_node("find_deals", find_deals))
+    workflow.add_node("query_db", traced_node("query_db", query_db))
+    workflow.add_node("generate_plan", traced_node("generate_plan", generate_plan))
 
-# Add Nodes
-workflow.add_node("parse_request", parse_request)
-workflow.add_node("find_deals", find_local_deals)
-workflow.add_node("query_db", query_meal_db)
-workflow.add_node("generate_plan", generate_plan)
+    # Define Edges: fan out to the lookups, join before planning
+    workflow.set_entry_point("parse_request")
+    workflow.add_edge("parse_request", "find_deals")
+    workflow.add_edge("parse_request", "query_db")
+    workflow.add_edge(["find_deals", "query_db"], "generate_plan")
+    workflow.add_edge("generate_plan", END)
 
-# Define Edges
-workflow.set_entry_point("parse_request")
-workflow.add_edge("parse_request", "find_deals")
-workflow.add_edge("find_deals", "query_db")
-workflow.add_edge("query_db", "generate_plan")
-workflow.add_edge("generate_plan", END)
+    return workflow.compile()
 
 # Compile
-app = workflow.compile()
+deals_cache = AsyncTTLCache(max_entries=LOOKUP_CACHE_SIZE, ttl=DEALS_CACHE_TTL)
+db_cache = AsyncTTLCache(max_entries=LOOKUP_CACHE_SIZE, ttl=DB_CACHE_TTL)
+app = build_graph(deals_cache=deals_cache, db_cache=db_cache)
 
-if __name__ == "__main__":
-    import sys
-    # Read query from args or use default
-    user_query = "I want a cheap vegetarian lunch, feeling happy."
-    
-    # Run the graph
+async def run_plan(user_query: str, graph=None) -> Dict[str, Any]:
+    """Run the graph for one query and return the final plan (or None)."""
+    graph = graph or app
     inputs = {"messages": [HumanMessage(content=user_query)]}
     final_plan = None
     
     # Iterate through stream to get final state
-    for output in app.stream(inputs):
-        if 'generate_plan' in output:
-            final_plan = output['generate_plan']['final_plan']
+    with tracer.span("plan_request"):
+        async for output in graph.astream(inputs):
+            if 'generate_plan' in output:
+                final_plan = output['generate_plan']['final_plan']
+    return final_plan
+
+async def serve(stream_in=sys.stdin, stream_out=sys.stdout, graph=None):
+    """
+    Long-lived planner service speaking JSON lines
+
+    The graph is compiled once and reused. Each input line is a request
+    {"id": ..., "query": "..."} (or {"id": ..., "op": "ping" | "stats" | "metrics"}); requests run
+    concurrently and every output line carries the request "id". A plan
+    request streams one {"event": "node", "node": ...} line per finished
+    node, then a final {"event": "result", "plan": ...} or
+    {"event": "error", "error": ...} line.
+    """
+    graph = graph or app
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    def emit(message):
+        stream_out.write(json.dumps(message) + '\n')
+        stream_out.flush()
+
+    async def handle(request_id, query):
+        try:
+            inputs = {"messages": [HumanMessage(content=query)]}
+            final_plan = None
+            with tracer.span("plan_request", request=request_id):
+                async for output in graph.astream(inputs):
+                    for node, update in output.items():
+                        emit({"id": request_id, "event": "node", "node": node})
+                        if node == 'generate_plan':
+                            final_plan = update['final_plan']
+            emit({"id": request_id, "event": "result", "plan": final_plan})
+        except Exception as e:
+            emit({"id": request_id, "event": "error", "error": str(e)})
+
+    while True:
+        line = await loop.run_in_executor(None, stream_in.readline)
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('op') == 'ping':
+                emit({"id": request_id, "event": "pong"})
+                continue
+            if request.get('op') == 'stats':
+                emit({"id": request_id, "event": "stats",
+                      "deals_cache": deals_cache.stats(), "db_cache": db_cache.stats()})
+                continue
+            if request.get('op') == 'metrics':
+                # Prometheus text exposition of node timings, errors and cache lookups
+                emit({"id": request_id, "event": "metrics", "text": tracer.metrics.render()})
+                continue
+            query = request.get('query')
+            if not query:
+                raise ValueError("Request needs a non-empty 'query'")
+        except Exception as e:
+            emit({"id": request_id, "event": "error", "error": str(e)})
+            continue
+
+        task = asyncio.ensure_future(handle(request_id, query))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    # Let in-flight requests finish once stdin closes
+    if pending:
+        await asyncio.gather(*pending)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Meal planner agent")
+    parser.add_argument("--query", default="I want a cheap vegetarian lunch, feeling happy.",
+                        help="User request to plan for")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived JSON-lines service on stdin/stdout")
+    args = parser.parse_args()
+
+    if args.serve:
+        asyncio.run(serve())
+        sys.exit(0)
+    
+    # Run the graph
+    final_plan = asyncio.run(run_plan(args.query))
             
     # Print ONLY the final JSON for the controller to capture
     if final_plan:
@@ -0,0 +1,47 @@
+import asyncio
+import copy
+from typing import List, Dict, Any
+
+# Local stand-ins for the deals (maps) API and the meal database. Both are
+# async with an injectable latency so the planner graph can be exercised
+# and benchmarked without network access.
+
+MOCK_DEALS = [
+    {"place": "Green Garden", "item": "Veggie Wrap", "price": 5.0, "location": "123 Main St"},
+    {"place": "Burger Joint", "item": "Cheeseburger", "price": 6.0, "location": "456 Elm St"}
+]
+
+MOCK_CANDIDATES = [
+    {"name": "Home Salad", "cost": 3.0, "type": "vegetarian"},
+    {"name": "Grilled Chicken", "cost": 5.0, "type": "non-vegetarian"}
+]
+
+
+class DealsService:
+    """Local deals lookup (stands in for Google Maps Places)."""
+
+    def __init__(self, latency: float = 0.0, deals: List[Dict[str, Any]] = None):
+        self.latency = latency
+        self.deals = deals if deals is not None else MOCK_DEALS
+        self.calls = 0
+
+    async def find_deals(self, constraints: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return copy.deepcopy(self.deals)
+
+
+class MealDBService:
+    """Local meal database query (stands in for MongoDB)."""
+
+    def __init__(self, latency: float = 0.0, candidates: List[Dict[str, Any]] = None):
+        self.latency = latency
+        self.candidates = candidates if candidates is not None else MOCK_CANDIDATES
+        self.calls = 0
+
+    async def query(self, constraints: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return copy.deepcopy(self.candidates)
@@ -0,0 +1,149 @@
+import bisect
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+# Histogram bucket upper bounds for durations (ms)
+DURATION_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Histogram bucket upper bounds for serialized state sizes (bytes)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("sapor_span", default=None)
+
+
+def _labels_key(labels: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Prometheus-style counters and histograms, rendered in text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Tuple[Tuple, Dict[Tuple, list]]] = {}  # name -> (bounds, key -> [counts, sum, count])
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=DURATION_BUCKETS, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            bounds, series = self._histograms.setdefault(name, (tuple(buckets), {}))
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * (len(bounds) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(bounds, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name, (bounds, series) in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, (counts, total, count) in series.items():
+                    cumulative = 0
+                    for bound, bucket in zip(bounds + ("+Inf",), counts):
+                        cumulative += bucket
+                        le = 'le="%s"' % bound
+                        lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total:g}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """
+    Timed spans that feed Metrics and, when enabled, are written as JSON lines.
+
+    Spans nest through a context variable, so they follow asyncio tasks;
+    the outermost span starts a new trace id. Every span records its wall
+    time in <prefix>_duration_ms{span=...} and its errors in
+    <prefix>_errors_total{span=...}.
+    """
+
+    def __init__(self, metrics: Metrics = None, sink=None, prefix: str = "sapor"):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.sink = sink
+        self.prefix = prefix
+        self._write_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        parent = _current_span.get()
+        span = {
+            "trace": parent["trace"] if parent else uuid.uuid4().hex[:16],
+            "span": name,
+            "parent": parent["span"] if parent else None,
+            "start": time.time()
+        }
+        span.update(attrs)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span["ms"] = round((time.perf_counter() - start) * 1000, 3)
+            self.metrics.inc(f"{self.prefix}_spans_total", span=name)
+            self.metrics.observe(f"{self.prefix}_duration_ms", span["ms"], span=name)
+            if span.get("error") or span.get("errors"):
+                self.metrics.inc(f"{self.prefix}_errors_total", span=name)
+            self._emit(span)
+
+    def _emit(self, span: Dict[str, Any]) -> None:
+        if self.sink is None:
+            return
+        line = json.dumps(span, default=str)
+        with self._write_lock:
+            self.sink.write(line + "\n")
+            self.sink.flush()
+
+
+def annotate(**attrs) -> None:
+    """Attach attributes to the active span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.update(attrs)
+
+
+def state_size(obj: Any) -> int:
+    """Approximate size of a graph state or update: bytes of its JSON form."""
+    return len(json.dumps(obj, default=str))
+
+
+def _default_sink():
+    # SAPOR_TRACE=1 writes spans to stderr; any other value is a file path
+    target = os.environ.get("SAPOR_TRACE", "")
+    if not target or target == "0":
+        return None
+    if target in ("1", "stderr"):
+        return sys.stderr
+    return open(target, "a", buffering=1)
+
+
+tracer = Tracer(sink=_default_sink())
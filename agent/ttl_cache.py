@@ -0,0 +1,106 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Width of the budget bands lookups are cached under ($)
+BUDGET_BAND = 5.0
+
+
+def lookup_key(constraints: Dict[str, Any], budget_band: float = BUDGET_BAND) -> Tuple:
+    """
+    Normalized cache key for a deals / meal DB lookup: (location, diet, budget band).
+
+    Location is case- and whitespace-insensitive, diet tags are order-
+    insensitive, and budgets within the same band share an entry.
+    """
+    location = " ".join(str(constraints.get("location") or "").lower().split())
+    diet = tuple(sorted({str(tag).strip().lower() for tag in constraints.get("diet") or []}))
+    budget = constraints.get("budget")
+    band = math.floor(float(budget) / budget_band) if budget is not None else None
+    return location, diet, band
+
+
+class AsyncTTLCache:
+    """
+    Size-bounded LRU cache with per-entry TTL for async lookups.
+
+    Concurrent misses for the same key are coalesced into one load; the load
+    runs as its own task so a caller timing out does not cancel it for the
+    others. Failed loads are not cached.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expired = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for key, calling loader() on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if self.clock() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expired += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store(key, done))
+        return await asyncio.shield(task)
+
+    def status(self, key: Hashable) -> str:
+        """What a lookup of key would do right now: "hit", "coalesced" or "miss"."""
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() < entry[0]:
+            return "hit"
+        return "coalesced" if key in self._inflight else "miss"
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Drop one key, or everything when key is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+        }
+
+    def _store(self, key: Hashable, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[key] = (self.clock() + self.ttl, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -62,13 +62,142 @@ const runPythonAgent = (scriptPath, payload) => {
     });
 };
 
+// Persistent planner service: `planner_agent.py --serve` compiles the graph
+// once and answers JSON-lines requests, so we pay the langgraph import and
+// compile cost once per process instead of once per request.
+const PLANNER_TIMEOUT_MS = parseInt(process.env.PLANNER_TIMEOUT_MS || '30000', 10);
+// Consecutive timeouts after which the planner child is assumed hung and respawned
+const PLANNER_MAX_TIMEOUTS = parseInt(process.env.PLANNER_MAX_TIMEOUTS || '2', 10);
+let plannerProcess = null;
+let plannerBuffer = '';
+let plannerTimeouts = 0;
+let nextPlannerId = 1;
+const plannerRequests = new Map(); // id -> { resolve, reject, onEvent, timer, child }
+
+// Reject the requests that were sent to one (now dead) child process
+const failPlannerRequests = (child, error) => {
+    for (const [id, { reject, timer, child: owner }] of plannerRequests) {
+        if (owner !== child) continue;
+        clearTimeout(timer);
+        plannerRequests.delete(id);
+        reject(error);
+    }
+};
+
+const handlePlannerLine = (line) => {
+    if (!line.trim()) return;
+    let message;
+    try {
+        message = JSON.parse(line);
+    } catch (e) {
+        console.error("Planner sent invalid JSON:", line);
+        return;
+    }
+    const pending = plannerRequests.get(message.id);
+    if (!pending) return;
+    plannerTimeouts = 0;
+
+    if (message.event === 'node') {
+        if (pending.onEvent) pending.onEvent(message);
+        return;
+    }
+    clearTimeout(pending.timer);
+    plannerRequests.delete(message.id);
+    if (message.event === 'result') {
+        pending.resolve(message.plan || { error: "Failed to generate plan" });
+    } else {
+        pending.reject(new Error(message.error || 'Planner request failed'));
+    }
+};
+
+const getPlannerProcess = () => {
+    if (plannerProcess) return plannerProcess;
+
+    const child = spawn('python', ['agent/planner_agent.py', '--serve'], {
+        cwd: path.join(__dirname, '../../'), // Run from project root
+        env: { ...process.env, PYTHONPATH: '.' } // Ensure imports work
+    });
+    plannerProcess = child;
+    plannerBuffer = '';
+    plannerTimeouts = 0;
+
+    child.stdout.on('data', (data) => {
+        plannerBuffer += data.toString();
+        const lines = plannerBuffer.split('\n');
+        plannerBuffer = lines.pop();
+        lines.forEach(handlePlannerLine);
+    });
+
+    child.stderr.on('data', (data) => {
+        // Node progress banners and tracebacks
+        console.error(`[planner] ${data.toString().trimEnd()}`);
+    });
+
+    // Only forget the child if it is still the current one; a late 'close'
+    // from a killed child must not drop its replacement
+    const reset = (error) => {
+        if (plannerProcess === child) plannerProcess = null;
+        failPlannerRequests(child, error);
+    };
+    child.on('error', reset);
+    // Writing to a child that already died raises EPIPE on stdin
+    child.stdin.on('error', reset);
+    child.on('close', (code) => {
+        reset(new Error(`Planner process exited with code ${code}`));
+    });
+
+    return child;
+};
+
+// Kill a planner that stopped answering; the next request spawns a fresh one
+const restartPlanner = (child) => {
+    console.error(`Planner timed out ${plannerTimeouts} times in a row; restarting it`);
+    if (plannerProcess === child) plannerProcess = null;
+    failPlannerRequests(child, new Error('Planner restarted after repeated timeouts'));
+    child.kill('SIGKILL');
+};
+
+// Send one query to the planner service; onEvent receives node progress events
+const runPlanner = (query, onEvent) => {
+    return new Promise((resolve, reject) => {
+        const id = nextPlannerId++;
+        const child = getPlannerProcess();
+        const timer = setTimeout(() => {
+            plannerRequests.delete(id);
+            reject(new Error(`Planner timed out after ${PLANNER_TIMEOUT_MS}ms`));
+            plannerTimeouts += 1;
+            if (plannerTimeouts >= PLANNER_MAX_TIMEOUTS) restartPlanner(child);
+        }, PLANNER_TIMEOUT_MS);
+        plannerRequests.set(id, { resolve, reject, onEvent, timer, child });
+        child.stdin.write(JSON.stringify({ id, query }) + '\n');
+    });
+};
+
 // Route: /api/agents/plan
+// With ?stream=1 the response is NDJSON: one line per finished graph node,
+// then the final plan.
 router.post('/plan', async (req, res) => {
+    const { query } = req.body;
+    if (!query) {
+        return res.status(400).json({ error: "query is required" });
+    }
+
+    if (req.query.stream) {
+        res.setHeader('Content-Type', 'application/x-ndjson');
+        try {
+            const plan = await runPlanner(query, (event) => {
+                res.write(JSON.stringify({ event: 'node', node: event.node }) + '\n');
+            });
+            res.end(JSON.stringify({ event: 'result', plan }) + '\n');
+        } catch (error) {
+            console.error("Agent Error:", error);
+            res.end(JSON.stringify({ event: 'error', error: error.message }) + '\n');
+        }
+        return;
+    }
+
     try {
-        const { query } = req.body;
-        // In a real app, we'd pass 'query' to the python script.
-        // For now, running the mock planner which has a default query.
-        const result = await runPythonAgent('agent/planner_agent.py', { query });
+        const result = await runPlanner(query);
         res.json(result);
     } catch (error) {
         console.error("Agent Error:", error);
@@ -101,9 +101,10 @@ router.get('/status', protect, async (req, res) => {
     try {
         const user = req.user;
         const userId = user._id.toString();
-        const modelPath = path.join(__dirname, '../../models', `${userId}.pkl`);
-
-        const modelExists = fs.existsSync(modelPath);
+        // A user's model is a pickle, a packed .sapor forest, or a shared-mode .json profile
+        const modelExists = ['.pkl', '.sapor', '.json'].some((ext) =>
+            fs.existsSync(path.join(__dirname, '../../models', `${userId}${ext}`))
+        );
 
         res.json({
             success: true,
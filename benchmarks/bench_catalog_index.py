@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark fuzzy meal-name lookup in the reward catalog index
+
+Builds a synthetic catalog of composed meal names, then looks up names
+with small typos (cold, then again from the match cache) and names that
+are not in the catalog. Reports build time, lookups per second and how
+often the typo'd names resolve to the meal they came from.
+
+Usage:
+    python benchmarks/bench_catalog_index.py [--sizes 1000,10000,50000] [--queries 5000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent.meal_catalog import MealCatalog
+from reward_functions.catalog_index import MealNameIndex
+
+STYLES = ["Grilled", "Roasted", "Spicy", "Baked", "Steamed", "Crispy", "Smoked", "Braised", "Pan-Seared", "Honey"]
+MAINS = ["Chicken", "Tofu", "Salmon", "Lentil", "Chickpea", "Beef", "Turkey", "Shrimp", "Paneer", "Tempeh", "Egg", "Mushroom"]
+SIDES = ["Quinoa", "Brown Rice", "Broccoli", "Sweet Potato", "Couscous", "Spinach", "Black Beans", "Kale", "Noodles", "Avocado"]
+FORMS = ["Bowl", "Wrap", "Salad", "Stir Fry", "Curry", "Plate", "Soup", "Tacos"]
+
+
+def synthetic_catalog(n, rng):
+    names = set()
+    while len(names) < n:
+        names.add(f"{rng.choice(STYLES)} {rng.choice(MAINS)} {rng.choice(FORMS)} with "
+                  f"{rng.choice(SIDES)} and {rng.choice(SIDES)} #{len(names)}")
+    return MealCatalog.from_records(
+        {"key": f"meal_{i}", "meal_name": name, "calories": rng.randint(150, 1200),
+         "protein": rng.randint(2, 70), "budget": round(rng.uniform(1.5, 25.0), 2), "dietary_tags": []}
+        for i, name in enumerate(sorted(names))
+    )
+
+
+def typo(name, rng):
+    chars = list(name)
+    for _ in range(2):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz ")
+    return "".join(chars)
+
+
+def lookups_per_second(index, names):
+    start = time.perf_counter()
+    index.match_many(names)
+    return len(names) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MealNameIndex")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'meals':>8}{'build_ms':>10}{'cold/s':>10}{'cached/s':>11}{'unknown/s':>11}{'recall':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rng = random.Random(args.seed)
+        catalog = synthetic_catalog(size, rng)
+        start = time.perf_counter()
+        index = MealNameIndex(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        targets = [rng.randrange(size) for _ in range(args.queries)]
+        queries = [typo(catalog.names[t], rng) for t in targets]
+        unknown = [f"{rng.choice(FORMS)} of the day {i}" for i in range(args.queries)]
+
+        cold = lookups_per_second(index, queries)
+        cached = lookups_per_second(index, queries)
+        missing = lookups_per_second(index, unknown)
+        positions, _ = index.match_many(queries)
+        recall = sum(int(p) == t for p, t in zip(positions, targets)) / len(targets)
+        print(f"{size:>8}{build_ms:>10.1f}{cold:>10.0f}{cached:>11.0f}{missing:>11.0f}{recall:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled constraint parser against the original one
+
+Generates a corpus of templated meal requests and parses it with the
+original per-call parser (repeated lower() calls and uncompiled
+re.search), with the compiled parser with its cache cleared, and with the
+compiled parser once its cache is warm. Checks that all three agree
+(apart from the high-protein keyword, which the original never matched)
+and reports queries per second.
+
+Usage:
+    python benchmarks/bench_constraint_parser.py [--queries 20000] [--distinct 2000]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent import constraint_parser
+
+TEMPLATES = [
+    "I need a {diet} {meal} under ${budget}, around {cal} cal",
+    "{meal} idea for {diet} diet. Budget: ${budget}. Calorie target: {cal}cal",
+    "Plan my {horizon} with {grams}g protein, ${budget} per day, {diet}",
+    "Cheap {meal} please, feeling hungry",
+    "high-protein {meal} for ${budget}",
+    "{horizon} of {diet} meals: breakfast, lunch and dinner, {cal} cal",
+]
+
+
+def legacy_parse(query):
+    constraints = {
+        "diet_type": None, "max_budget": None, "calorie_target": None,
+        "protein_preference": None, "meal_type": "lunch", "meal_types": [],
+        "horizon": None, "protein_target": None, "budget_per_day": False
+    }
+    if "vegetarian" in query.lower():
+        constraints["diet_type"] = "vegetarian"
+    if "vegan" in query.lower():
+        constraints["diet_type"] = "vegan"
+    if "high.?protein" in query.lower():
+        constraints["protein_preference"] = "high"
+    budget_match = re.search(r'\$(\d+(?:\.\d{2})?)', query)
+    if budget_match:
+        constraints["max_budget"] = float(budget_match.group(1))
+    cal_match = re.search(r'(\d+)\s*cal', query.lower())
+    if cal_match:
+        constraints["calorie_target"] = int(cal_match.group(1))
+    for meal_type in ["breakfast", "lunch", "dinner", "snack"]:
+        if meal_type in query.lower():
+            constraints["meal_type"] = meal_type
+            break
+    constraints["meal_types"] = [
+        m for m in ["breakfast", "lunch", "dinner", "snack"] if m in query.lower()
+    ]
+    if re.search(r'\bweek(?:ly)?\b|\b7[- ]days?\b', query.lower()):
+        constraints["horizon"] = "week"
+    elif re.search(r'\b(?:full|whole|entire|all) day\b|\bday plan\b|\bdaily plan\b', query.lower()):
+        constraints["horizon"] = "day"
+    protein_match = re.search(r'(\d+)\s*g(?:rams?)?\s+(?:of\s+)?protein', query.lower())
+    if protein_match:
+        constraints["protein_target"] = int(protein_match.group(1))
+    if re.search(r'\b(?:per|a|each) day\b|/\s*day\b', query.lower()):
+        constraints["budget_per_day"] = True
+    return constraints
+
+
+def corpus(distinct, total, rng):
+    unique = [
+        rng.choice(TEMPLATES).format(
+            diet=rng.choice(["vegetarian", "vegan", "keto", "balanced"]),
+            meal=rng.choice(["breakfast", "lunch", "dinner", "snack"]),
+            budget=rng.choice(["5", "8", "12.50", "20"]),
+            cal=rng.randint(200, 2500),
+            grams=rng.randint(40, 180),
+            horizon=rng.choice(["full day plan", "week", "7-day plan", "daily plan"]),
+        )
+        for _ in range(distinct)
+    ]
+    return [rng.choice(unique) for _ in range(total)]
+
+
+def queries_per_second(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return len(queries) / (time.perf_counter() - start), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the constraint parser")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--distinct", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = corpus(args.distinct, args.queries, random.Random(args.seed))
+
+    legacy_qps, expected = queries_per_second(legacy_parse, queries)
+
+    constraint_parser._parse.cache_clear()
+    cold_qps, _ = queries_per_second(lambda q: constraint_parser._parse.__wrapped__(q), queries)
+    warm_qps, actual = queries_per_second(constraint_parser.parse_constraints, queries)
+
+    for query, old, new in zip(queries, expected, actual):
+        if "high" in query.lower():
+            new = dict(new, protein_preference=None)
+        assert old == new, f"parsers disagree on {query!r}: {old} vs {new}"
+
+    print(f"{args.queries} queries ({args.distinct} distinct)")
+    print(f"original parser:     {legacy_qps:>12,.0f} queries/s ({1e6 / legacy_qps:.2f} us)")
+    print(f"compiled, uncached:  {cold_qps:>12,.0f} queries/s ({1e6 / cold_qps:.2f} us)")
+    print(f"compiled, cached:    {warm_qps:>12,.0f} queries/s ({1e6 / warm_qps:.2f} us)")
+    print(f"cache: {constraint_parser.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark columnar MealCatalog loading and footprint
+
+Writes a synthetic catalog as JSONL and as a compiled .npz, then reports
+load time and in-memory column size for each, next to the cost of building
+one MealRecommendation dataclass per meal (the old dict-of-meals layout).
+
+Usage:
+    python benchmarks/bench_meal_catalog.py [--meals 100000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent.meal_catalog import MealCatalog
+from bench_meal_index import synthetic_records
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MealCatalog load time and size")
+    parser.add_argument("--meals", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.meals, random.Random(args.seed))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, "catalog.jsonl")
+        npz_path = os.path.join(tmp, "catalog.npz")
+        with open(jsonl_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        MealCatalog.load(jsonl_path).save_compiled(npz_path)
+
+        jsonl_ms, catalog = timed(lambda: MealCatalog.load(jsonl_path))
+        npz_ms, compiled = timed(lambda: MealCatalog.load(npz_path))
+        objects_ms, _ = timed(lambda: {key: meal for key, meal in catalog.items()})
+        assert list(catalog.keys()) == list(compiled.keys())
+
+    print(f"{args.meals} meals, columns in memory: {catalog.nbytes / 1024 / 1024:.2f} MB")
+    print(f"load from jsonl:        {jsonl_ms:>9.1f} ms")
+    print(f"load from compiled npz: {npz_ms:>9.1f} ms")
+    print(f"materialize every meal: {objects_ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
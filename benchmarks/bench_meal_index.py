@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark MealIndex queries against the original linear scan
+
+Builds synthetic columnar catalogs of 1k/10k/100k meals, runs the same
+random constraint queries through a full scan over MealRecommendation
+objects (the pre-index _tool_get_meal_options logic) and through
+MealIndex, checks that both return the same meals and reports
+microseconds per query.
+
+Usage:
+    python benchmarks/bench_meal_index.py [--sizes 1000,10000,100000] [--queries 200]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent.meal_catalog import MealCatalog
+from agent.meal_index import MealIndex
+
+TAGS = ["vegetarian", "vegan", "gluten-free", "high-protein", "low-carb", "dairy-free", "keto", "paleo"]
+
+
+def synthetic_records(n, rng):
+    return [
+        {
+            "key": f"meal_{i}",
+            "meal_name": f"Meal {i}",
+            "calories": rng.randint(150, 1200),
+            "protein": rng.randint(2, 70),
+            "budget": round(rng.uniform(1.5, 25.0), 2),
+            "dietary_tags": rng.sample(TAGS, rng.randint(0, 3))
+        }
+        for i in range(n)
+    ]
+
+
+def synthetic_queries(n, rng):
+    return [
+        {
+            "diet_type": rng.choice([None, None] + TAGS),
+            "max_budget": rng.choice([None, 5.0, 8.0, 12.0, 20.0]),
+            "calorie_target": rng.choice([None, 300, 400, 600, 800])
+        }
+        for _ in range(n)
+    ]
+
+
+def scan(meals, constraints):
+    options = []
+    for meal in meals:
+        if constraints["diet_type"] and constraints["diet_type"] not in meal.dietary_tags:
+            continue
+        if constraints["max_budget"] and meal.budget > constraints["max_budget"]:
+            continue
+        if constraints["calorie_target"]:
+            target = constraints["calorie_target"]
+            if not (target * 0.8 <= meal.calories <= target * 1.2):
+                continue
+        options.append(meal)
+    return options
+
+
+def per_query_us(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) * 1e6 / len(queries), results
+
+
+def matched_names(meals):
+    return [meal.meal_name for meal in meals]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MealIndex vs linear scan")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = synthetic_queries(args.queries, rng)
+
+    print(f"{'meals':>8}{'build ms':>10}{'scan us':>12}{'index us':>12}{'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        catalog = MealCatalog.from_records(synthetic_records(size, rng))
+        meals = list(catalog.values())
+
+        start = time.perf_counter()
+        index = MealIndex(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        scan_us, expected = per_query_us(lambda q: scan(meals, q), queries)
+        index_us, positions = per_query_us(lambda q: index.query(**q), queries)
+        actual = [[meals[pos] for pos in found] for found in positions]
+        assert list(map(matched_names, expected)) == list(map(matched_names, actual)), \
+            "index results differ from linear scan"
+
+        print(f"{size:>8}{build_ms:>10.1f}{scan_us:>12.1f}{index_us:>12.1f}{scan_us / index_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
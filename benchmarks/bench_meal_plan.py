@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark the multi-meal plan optimizer over catalog size and horizon
+
+For each synthetic catalog size and plan length, plans breakfast, lunch,
+dinner and a snack against fixed daily targets and reports wall time,
+search nodes, objective and whether the search finished inside the time
+budget.
+
+Usage:
+    python benchmarks/bench_meal_plan.py [--sizes 1000,10000,100000] [--horizons 1,7] [--timeBudget 0.25]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent.meal_catalog import MealCatalog
+from agent.meal_index import MealIndex
+from agent.meal_plan_optimizer import MealPlanOptimizer, PlanTargets
+from bench_meal_index import synthetic_records
+
+SLOTS = ["breakfast", "lunch", "dinner", "snack"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MealPlanOptimizer")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--horizons", default="1,7")
+    parser.add_argument("--timeBudget", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    targets = PlanTargets(calories=2000, protein=90, budget=30.0)
+    print(f"{'meals':>8}{'days':>6}{'ms':>10}{'nodes':>10}{'objective':>11}{'complete':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        catalog = MealCatalog.from_records(synthetic_records(size, random.Random(args.seed)))
+        optimizer = MealPlanOptimizer(catalog, MealIndex(catalog))
+        for days in (int(h) for h in args.horizons.split(",")):
+            start = time.perf_counter()
+            result = optimizer.plan(SLOTS, days, targets, time_budget=args.timeBudget)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{size:>8}{days:>6}{elapsed:>10.1f}{result['nodes']:>10}"
+                  f"{result['objective']:>11.4f}{str(result['complete']):>10}")
+
+
+if __name__ == "__main__":
+    main()
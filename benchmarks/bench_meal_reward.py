@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark meal reward parsing and batch scoring on synthetic completions
+
+Builds corpora of well-formed, malformed and adversarial completions
+(repeated markers with no closing field, which make the lazy DOTALL regex
+backtrack), checks that parse_completion agrees with the reference regex,
+and reports per-completion parse time for both. Then scores a large batch
+in-process and through the process pool.
+
+Usage:
+    python benchmarks/bench_meal_reward.py [--size 4096] [--workers 4]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reward_functions.meal_reward import MealRewardFunction, parse_completion
+
+MEALS = ["Grilled Chicken with Quinoa", "Greek Yogurt Parfait", "Lentil Soup", "Tofu Stir Fry", "Veggie Wrap"]
+
+
+def well_formed(rng):
+    return (f"**Recommendation:** {rng.choice(MEALS)}\n"
+            f"**Calories:** {rng.randint(150, 1200)}\n"
+            f"**Protein:** {rng.randint(2, 120)}g\n"
+            f"**Budget:** ${rng.uniform(1, 20):.2f}\n\n"
+            "This meal matches your requirements and is within your budget.")
+
+
+def malformed(rng):
+    text = well_formed(rng)
+    field = rng.choice(["**Protein:**", "**Budget:**", "g\n", "$"])
+    return text.replace(field, "", 1)
+
+
+def adversarial(rng):
+    filler = " ".join(rng.choice(MEALS) for _ in range(20))
+    return ("**Recommendation:** " + rng.choice(MEALS) + "\n"
+            + "".join(f"**Calories:** {rng.randint(100, 900)} {filler}\n" for _ in range(30))
+            + "**Protein:** lots")
+
+
+def time_per_item(fn, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        fn(text)
+    return (time.perf_counter() - start) / len(corpus) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark meal reward scoring")
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpora = {
+        "well_formed": [well_formed(rng) for _ in range(args.size)],
+        "malformed": [malformed(rng) for _ in range(args.size)],
+        "adversarial": [adversarial(rng) for _ in range(max(1, args.size // 8))]
+    }
+
+    pattern = MealRewardFunction.PATTERN
+    print(f"{'corpus':>12}{'regex_us':>10}{'scan_us':>10}{'speedup':>9}")
+    for name, corpus in corpora.items():
+        for text in corpus:
+            match = pattern.search(text)
+            assert parse_completion(text) == (match.groups() if match else None), text
+        regex_us = time_per_item(pattern.search, corpus)
+        scan_us = time_per_item(parse_completion, corpus)
+        print(f"{name:>12}{regex_us:>10.2f}{scan_us:>10.2f}{regex_us / scan_us:>8.1f}x")
+
+    batch = [text for corpus in corpora.values() for text in corpus]
+    prompts = ["Plan a meal"] * len(batch)
+    serial = MealRewardFunction()
+    pooled = MealRewardFunction(workers=args.workers, parallel_threshold=1)
+    pooled(prompts[:1], batch[:1])  # start the pool outside the timing
+
+    start = time.perf_counter()
+    expected = serial(prompts, batch)
+    serial_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    rewards = pooled(prompts, batch)
+    pooled_ms = (time.perf_counter() - start) * 1000
+    pooled.close()
+    assert rewards.tolist() == expected.tolist()
+    print(f"\nbatch of {len(batch)}: in-process {serial_ms:.1f} ms, "
+          f"{args.workers} workers {pooled_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
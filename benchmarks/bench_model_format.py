@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark pickle vs packed (memory-mapped) model loading
+
+Trains synthetic users into a temporary models directory, converts each
+pickle with model_format.convert, and compares per-model load time,
+scoring latency and prediction agreement between the two formats.
+
+Usage:
+    python benchmarks/bench_model_format.py --users 30 --meals 200
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import contextlib
+import io
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+
+import trainer
+import model_format
+import shared_model
+
+def time_per_item(fn, items):
+    start = time.perf_counter()
+    results = [fn(item) for item in items]
+    return (time.perf_counter() - start) * 1000 / len(items), results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pickle vs packed model loading')
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--meals', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    meals = (rng.random((args.meals, 14)) > 0.5).astype(np.float64)
+    
+    with tempfile.TemporaryDirectory() as model_dir:
+        trainer.MODEL_DIR = model_dir
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.users):
+                tastes, moods, carbon = shared_model.sample_preferences(
+                    rng, trainer.TASTE_OPTIONS, trainer.MOOD_OPTIONS)
+                trainer.train_model(f'bench{i}', tastes, moods, carbon, n_jobs=1)
+        
+        pickles = [os.path.join(model_dir, f'bench{i}.pkl') for i in range(args.users)]
+        packed = [model_format.convert(path) for path in pickles]
+        
+        pkl_load, pkl_models = time_per_item(joblib.load, pickles)
+        packed_load, packed_models = time_per_item(model_format.load_packed, packed)
+        
+        pkl_score, pkl_scores = time_per_item(lambda m: m['model'].predict_proba(meals), pkl_models)
+        packed_score, packed_scores = time_per_item(lambda m: m['model'].predict_proba(meals), packed_models)
+        
+        max_diff = max(np.abs(a - b).max() for a, b in zip(pkl_scores, packed_scores))
+        pkl_kb = sum(os.path.getsize(p) for p in pickles) / 1024 / args.users
+        packed_kb = sum(os.path.getsize(p) for p in packed) / 1024 / args.users
+    
+    print(f"{args.users} models, {args.meals} meals per scoring call")
+    print(f"{'format':<10}{'KB/model':>10}{'load ms':>10}{'score ms':>10}")
+    print(f"{'pkl':<10}{pkl_kb:>10.1f}{pkl_load:>10.3f}{pkl_score:>10.3f}")
+    print(f"{'sapor':<10}{packed_kb:>10.1f}{packed_load:>10.3f}{packed_score:>10.3f}")
+    print(f"max |proba difference|: {max_diff:.2e}")
+
+if __name__ == '__main__':
+    main()
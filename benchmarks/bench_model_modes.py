@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-user vs shared model storage and scoring latency
+
+Trains the same synthetic users in both modes into a temporary models
+directory and reports on-disk size, cold (load + score) latency and warm
+(cached) latency for scoring a batch of meals.
+
+Usage:
+    python benchmarks/bench_model_modes.py --users 50 --meals 200
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+import contextlib
+import io
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+
+import trainer
+import predictor
+import shared_model
+
+def dir_size(path, suffix):
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path) if name.endswith(suffix)
+    )
+
+def time_scoring(user_ids, meals):
+    """Return (cold ms per user, warm ms per user) for scoring `meals` per user"""
+    predictor.model_cache.invalidate()
+    start = time.perf_counter()
+    for user_id in user_ids:
+        predictor.predict_scores(user_id, meals)
+    cold = (time.perf_counter() - start) * 1000 / len(user_ids)
+    
+    start = time.perf_counter()
+    for user_id in user_ids:
+        predictor.predict_scores(user_id, meals)
+    warm = (time.perf_counter() - start) * 1000 / len(user_ids)
+    return cold, warm
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-user vs shared models')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--meals', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    meals = (rng.random((args.meals, 14)) > 0.5).astype(np.float64)
+    users = [
+        (f'bench{i}', *shared_model.sample_preferences(rng, trainer.TASTE_OPTIONS, trainer.MOOD_OPTIONS))
+        for i in range(args.users)
+    ]
+    
+    with tempfile.TemporaryDirectory() as model_dir:
+        trainer.MODEL_DIR = predictor.MODEL_DIR = model_dir
+        results = {}
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for user_id, tastes, moods, carbon in users:
+                trainer.train_model(user_id, tastes, moods, carbon)
+            per_user_train = time.perf_counter() - start
+        per_user_bytes = dir_size(model_dir, '.pkl')
+        results['per_user'] = (per_user_train, per_user_bytes, *time_scoring([u[0] for u in users], meals))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            shared_model.train_global_model(model_dir)
+            for user_id, tastes, moods, carbon in users:
+                trainer.save_shared_profile(user_id, tastes, moods, carbon)
+            shared_train = time.perf_counter() - start
+        shared_bytes = dir_size(model_dir, '.json') + dir_size(model_dir, '.pkl')
+        results['shared'] = (shared_train, shared_bytes, *time_scoring([u[0] for u in users], meals))
+    
+    print(f"{args.users} users, {args.meals} meals per scoring call")
+    print(f"{'mode':<10}{'train s':>10}{'disk KB':>12}{'KB/user':>10}{'cold ms':>10}{'warm ms':>10}")
+    for mode, (train_s, nbytes, cold, warm) in results.items():
+        print(f"{mode:<10}{train_s:>10.2f}{nbytes / 1024:>12.1f}{nbytes / 1024 / args.users:>10.2f}"
+              f"{cold:>10.2f}{warm:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark planner graph latency against injected service latency
+
+Runs the planner graph with the local deals and meal DB stand-ins set to
+the given latencies and reports per-request wall time next to the sum and
+max of the two lookups. With the lookups fanned out in parallel, latency
+should track max(), not sum(). The last row puts the deals service past
+its timeout to show the graph still returns a plan. With --cache the
+lookups go through TTL caches and the deals cache hit rate is reported.
+
+Usage:
+    python benchmarks/bench_planner_graph.py [--latencies 0.05:0.2,0.2:0.2] [--requests 20] [--cache]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+import io
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from agent.planner_agent import build_graph, run_plan
+from agent.planner_services import DealsService, MealDBService
+from agent.ttl_cache import AsyncTTLCache
+
+QUERY = "I want a cheap vegetarian lunch, feeling happy."
+
+
+async def time_requests(graph, requests):
+    elapsed = []
+    plan = None
+    for _ in range(requests):
+        start = time.perf_counter()
+        # Node banners go to stderr; keep them out of the table
+        with contextlib.redirect_stderr(io.StringIO()):
+            plan = await run_plan(QUERY, graph)
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return elapsed, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark planner graph fan-out")
+    parser.add_argument("--latencies", default="0.05:0.2,0.2:0.2,0.2:0.05",
+                        help="Comma-separated deals:db latencies in seconds")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--cache", action="store_true", help="Route lookups through TTL caches")
+    args = parser.parse_args()
+
+    cases = [tuple(float(v) for v in pair.split(":")) for pair in args.latencies.split(",")]
+    cases.append((args.timeout * 2, 0.05))
+
+    print(f"{'deals_ms':>10}{'db_ms':>8}{'sum_ms':>8}{'max_ms':>8}{'p50_ms':>9}{'p95_ms':>9}{'hit_rate':>10}  errors")
+    for deals_latency, db_latency in cases:
+        deals_cache = AsyncTTLCache() if args.cache else None
+        db_cache = AsyncTTLCache() if args.cache else None
+        graph = build_graph(DealsService(deals_latency), MealDBService(db_latency),
+                            deals_timeout=args.timeout, db_timeout=args.timeout,
+                            deals_cache=deals_cache, db_cache=db_cache)
+        elapsed, plan = asyncio.run(time_requests(graph, args.requests))
+        elapsed.sort()
+        p50 = elapsed[len(elapsed) // 2]
+        p95 = elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))]
+        print(f"{deals_latency * 1000:>10.0f}{db_latency * 1000:>8.0f}"
+              f"{(deals_latency + db_latency) * 1000:>8.0f}{max(deals_latency, db_latency) * 1000:>8.0f}"
+              f"{p50:>9.1f}{p95:>9.1f}"
+              f"{deals_cache.stats()['hit_rate'] if deals_cache else 0.0:>10.2f}  {len((plan or {}).get('errors', []))}")
+
+
+if __name__ == "__main__":
+    main()
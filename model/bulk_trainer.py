@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+SAPOR Bulk Trainer
+
+Trains models for many users in one process pool instead of spawning
+trainer.py once per user. sklearn is imported once per worker, each
+forest is fitted with a fixed number of threads so workers do not
+oversubscribe the CPU, and every model is written atomically.
+
+Input is JSON lines, one user per line:
+    {"userId": "123", "tastes": ["spicy", "sweet"], "moods": ["cozy"], "carbon": "low"}
+(tastes and moods may also be comma-separated strings)
+
+Usage:
+    python bulk_trainer.py --input users.jsonl [--workers 8] [--threadsPerWorker 1] [--mode per_user|shared] [--format pkl|sapor]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import trainer
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train recommendation models for many users')
+    parser.add_argument('--input', required=True, help='JSON-lines file of user preferences, or - for stdin')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    parser.add_argument('--threadsPerWorker', type=int, default=1,
+                        help='Threads each worker may use for fitting (forest n_jobs and BLAS/OpenMP)')
+    parser.add_argument('--mode', default='per_user', choices=['per_user', 'shared'],
+                        help='Train per-user forests or store shared-model profiles')
+    parser.add_argument('--format', default='pkl', choices=['pkl', 'sapor'],
+                        help='On-disk format for per-user models')
+    parser.add_argument('--samples', type=int, default=100, help='Synthetic training examples per user')
+    return parser.parse_args()
+
+def _split(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [v.strip().lower() for v in value if v.strip()]
+
+def parse_record(record):
+    """Normalize one input record to (user_id, tastes, moods, carbon)"""
+    tastes = _split(record.get('tastes', []))
+    if not tastes:
+        raise ValueError('At least one taste preference is required')
+    carbon = record.get('carbon', record.get('carbonPreference'))
+    if carbon not in ('low', 'medium', 'high'):
+        raise ValueError(f"Invalid carbon preference: {carbon}")
+    return str(record['userId']), tastes, _split(record.get('moods', [])), carbon
+
+def _init_worker(threads):
+    """Cap native thread pools in this worker so N workers use ~N * threads cores"""
+    global _thread_limits
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        _thread_limits = threadpool_limits(limits=threads)
+    except ImportError:
+        _thread_limits = None
+
+def _train_one(job):
+    """Train a single user; never raises so one bad record cannot sink a batch"""
+    record, mode, threads, n_samples, fmt = job
+    start = time.perf_counter()
+    user_id = record.get('userId') if isinstance(record, dict) else None
+    try:
+        user_id, tastes, moods, carbon = parse_record(record)
+        if mode == 'shared':
+            trainer.save_shared_profile(user_id, tastes, moods, carbon, verbose=False)
+        else:
+            trainer.train_model(user_id, tastes, moods, carbon, n_samples=n_samples,
+                                n_jobs=threads, verbose=False, fmt=fmt)
+        return user_id, None, time.perf_counter() - start
+    except Exception as e:
+        return user_id, str(e), time.perf_counter() - start
+
+def read_records(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def train_bulk(records, workers=None, threads_per_worker=1, mode='per_user', n_samples=100, fmt='pkl'):
+    """
+    Train every record across a process pool
+    
+    Returns:
+        dict: Summary with counts, per-user failures and throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = [(record, mode, threads_per_worker, n_samples, fmt) for record in records]
+    
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(threads_per_worker,)) as pool:
+            results = list(pool.map(_train_one, jobs, chunksize=chunksize))
+    else:
+        _init_worker(threads_per_worker)
+        results = [_train_one(job) for job in jobs]
+    elapsed = time.perf_counter() - start
+    
+    failures = {str(user_id): error for user_id, error, _ in results if error is not None}
+    trained = len(results) - len(failures)
+    return {
+        'trained': trained,
+        'failed': len(failures),
+        'failures': failures,
+        'seconds': round(elapsed, 3),
+        'users_per_second': round(trained / elapsed, 2) if elapsed > 0 else 0.0,
+        'mean_fit_seconds': round(sum(r[2] for r in results) / len(results), 4) if results else 0.0,
+        'workers': workers,
+        'threads_per_worker': threads_per_worker
+    }
+
+if __name__ == '__main__':
+    try:
+        args = parse_args()
+        
+        if args.input == '-':
+            records = list(read_records(sys.stdin))
+        else:
+            with open(args.input) as f:
+                records = list(read_records(f))
+        
+        print(f"🤖 Bulk training {len(records)} users with {args.workers} workers "
+              f"x {args.threadsPerWorker} threads")
+        summary = train_bulk(records, args.workers, args.threadsPerWorker, args.mode, args.samples,
+                             args.format)
+        
+        for user_id, error in summary['failures'].items():
+            print(f"❌ {user_id}: {error}")
+        print(f"✅ Trained {summary['trained']} users in {summary['seconds']:.1f}s "
+              f"({summary['users_per_second']:.1f} users/s)")
+        print(json.dumps(summary))
+        sys.exit(1 if summary['failed'] else 0)
+        
+    except Exception as e:
+        print(f"❌ Bulk training failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
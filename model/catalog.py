@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+SAPOR Meal Catalog Feature Store
+
+Encodes the meal catalog once into a contiguous float32 matrix laid out
+like trainer.encode_preferences (7 tastes, 6 moods, carbon), with an
+id -> row index, so scoring a user against the catalog needs only meal ids
+instead of per-request feature strings.
+
+File (for a catalog at <path>):
+    <path>.npz        uncompressed; 'features' is the (n_meals, 14) float32
+                      matrix, memory-mapped on load, and 'ids' the meal ids
+                      in row order. One file, so a rebuild swaps both at once.
+
+Input is JSON lines, one meal per line:
+    {"id": "m1", "tastes": ["spicy"], "moods": ["cozy"], "carbon": "low"}
+carbon may also be a number in [0, 1]; a precomputed "features" list is
+used as-is.
+
+Usage:
+    python catalog.py build --input meals.jsonl [--output ../models/meal_catalog]
+"""
+
+import os
+import sys
+import json
+import struct
+import zipfile
+import argparse
+import numpy as np
+
+DEFAULT_CATALOG = os.environ.get(
+    'SAPOR_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models', 'meal_catalog')
+)
+
+CARBON_LEVELS = {'low': 0.0, 'medium': 0.5, 'high': 1.0}
+
+def encode_meal(meal):
+    """Encode one catalog record in the encode_preferences feature layout"""
+    if 'features' in meal:
+        return [float(x) for x in meal['features']]
+    
+    from trainer import encode_preferences
+    carbon = meal.get('carbon', 'medium')
+    tastes = [t.lower() for t in meal.get('tastes', [])]
+    moods = [m.lower() for m in meal.get('moods', [])]
+    if isinstance(carbon, str):
+        return encode_preferences(tastes, moods, carbon.lower())
+    vector = encode_preferences(tastes, moods, 'low')
+    vector[-1] = float(carbon)
+    return vector
+
+def build_catalog(meals, path=DEFAULT_CATALOG):
+    """
+    Encode meals and persist the feature matrix and id index
+    
+    Returns:
+        MealCatalog: The freshly written catalog, memory-mapped
+    """
+    ids = []
+    rows = []
+    for meal in meals:
+        ids.append(str(meal['id']))
+        rows.append(encode_meal(meal))
+    if len(set(ids)) != len(ids):
+        raise ValueError("Duplicate meal ids in catalog")
+    
+    matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), -1)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Features and ids share one file, renamed into place in a single step
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    try:
+        np.savez(tmp_path, features=matrix, ids=np.array(ids, dtype=str))
+        os.replace(tmp_path, f'{path}.npz')
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    return MealCatalog.load(path)
+
+def _memmap_member(f, name):
+    """
+    Memory-map one array of an uncompressed .npz open as f
+    
+    np.load cannot map archive members, but np.savez stores them
+    uncompressed, so the member's .npy payload is a plain byte range of the
+    archive that np.memmap can map directly.
+    """
+    with zipfile.ZipFile(f) as archive:
+        info = archive.getinfo(f'{name}.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            with archive.open(info) as member:
+                return np.lib.format.read_array(member)
+    
+    # The local file header (30 bytes) ends with the name and extra field lengths
+    f.seek(info.header_offset + 26)
+    name_len, extra_len = struct.unpack('<HH', f.read(4))
+    f.seek(info.header_offset + 30 + name_len + extra_len)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return np.memmap(f, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                     order='F' if fortran_order else 'C')
+
+class MealCatalog:
+    """Memory-mapped catalog feature matrix with an id -> row index"""
+    
+    def __init__(self, matrix, ids):
+        if len(ids) != len(matrix):
+            raise ValueError("Catalog ids and feature rows are out of sync")
+        self.matrix = matrix
+        self.ids = ids
+        self.index = {meal_id: row for row, meal_id in enumerate(ids)}
+    
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOG):
+        # Read ids and map features through one handle, so both come from
+        # the same file even if a rebuild replaces it meanwhile
+        with open(f'{path}.npz', 'rb') as f:
+            with np.load(f) as data:
+                ids = data['ids'].tolist()
+            matrix = _memmap_member(f, 'features')
+        return cls(matrix, ids)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def rows(self, meal_ids):
+        """Row indices for meal ids; raises KeyError naming any unknown id"""
+        try:
+            return np.fromiter((self.index[str(m)] for m in meal_ids), dtype=np.intp)
+        except KeyError as e:
+            raise KeyError(f"Meal not in catalog: {e.args[0]}") from None
+    
+    def features(self, meal_ids=None):
+        """Feature rows for the given meal ids, or the whole catalog"""
+        if meal_ids is None:
+            return self.matrix
+        return self.matrix[self.rows(meal_ids)]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the meal catalog feature store')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--input', required=True, help='JSON-lines meal file, or - for stdin')
+    parser.add_argument('--output', default=DEFAULT_CATALOG, help='Catalog path (without extension)')
+    args = parser.parse_args()
+    
+    try:
+        if args.input == '-':
+            meals = [json.loads(line) for line in sys.stdin if line.strip()]
+        else:
+            with open(args.input) as f:
+                meals = [json.loads(line) for line in f if line.strip()]
+        
+        catalog = build_catalog(meals, args.output)
+        print(f"✅ Encoded {len(catalog)} meals into {args.output}.npz")
+        sys.exit(0)
+    except Exception as e:
+        print(f"❌ Catalog build failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+SAPOR Packed Model Format
+
+A versioned on-disk format for trained forests that loads in near-zero
+time: the numeric arrays (tree nodes, leaf values, scaler statistics) are
+stored uncompressed and memory-mapped, so several predictor processes
+share the same pages through the OS cache instead of each unpickling its
+own copy.
+
+File layout (<userId>.sapor):
+    8 bytes   magic b'SAPORMDL'
+    4 bytes   format version (uint32, little endian)
+    4 bytes   header length (uint32, little endian)
+    header    UTF-8 JSON: metadata plus {name: {dtype, shape, offset}} per array
+    arrays    raw little-endian arrays, each aligned to 64 bytes
+
+Usage:
+    python model_format.py convert --all [--remove]
+    python model_format.py convert --userId <id> [--remove]
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+
+MAGIC = b'SAPORMDL'
+FORMAT_VERSION = 1
+EXTENSION = '.sapor'
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+def pack_forest(model):
+    """
+    Flatten a fitted RandomForestClassifier into concatenated node arrays
+    
+    Child indices are rewritten to global node indices (-1 marks a leaf) and
+    leaf values are normalized to class probabilities, so predictions need
+    no per-tree bookkeeping.
+    """
+    lefts, rights, features, thresholds, values, offsets = [], [], [], [], [], []
+    n_nodes = 0
+    max_depth = 0
+    
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        lefts.append(np.where(is_leaf, -1, tree.children_left + n_nodes))
+        rights.append(np.where(is_leaf, -1, tree.children_right + n_nodes))
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        value = tree.value[:, 0, :]
+        values.append(value / value.sum(axis=1, keepdims=True))
+        offsets.append(n_nodes)
+        n_nodes += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+    
+    arrays = {
+        'left': np.concatenate(lefts).astype('<i4'),
+        'right': np.concatenate(rights).astype('<i4'),
+        'feature': np.concatenate(features).astype('<i4'),
+        'threshold': np.concatenate(thresholds).astype('<f8'),
+        'value': np.vstack(values).astype('<f8'),
+        'tree_offsets': np.array(offsets, dtype='<i8')
+    }
+    meta = {
+        'classes': [c.item() if hasattr(c, 'item') else c for c in model.classes_],
+        'n_features': int(model.n_features_in_),
+        'max_depth': int(max_depth)
+    }
+    return arrays, meta
+
+class PackedForest:
+    """
+    Read-only forest over packed (possibly memory-mapped) node arrays
+    
+    Mirrors the predict_proba/classes_ interface of the sklearn estimator it
+    was packed from. All trees and rows are traversed together, one
+    vectorized step per tree level.
+    """
+    
+    def __init__(self, arrays, classes, n_features, max_depth):
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.value = arrays['value']
+        self.tree_offsets = arrays['tree_offsets']
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = n_features
+        self.max_depth = max_depth
+    
+    def apply(self, X):
+        """Leaf node index of every (tree, row) pair, shape (n_trees, n_rows)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        
+        rows = np.arange(X.shape[0])
+        node = np.repeat(self.tree_offsets[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            child = np.where(go_left, left, self.right[node])
+            node = np.where(left >= 0, child, node)
+        return node
+    
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=0)
+    
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+class PackedScaler:
+    """Fitted StandardScaler statistics, enough to transform inputs"""
+    
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+    
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+def save_packed(path, model_data):
+    """
+    Write a trained model dict (as produced by trainer.py) in packed format
+    
+    The file is written next to its destination and renamed into place.
+    """
+    arrays, meta = pack_forest(model_data['model'])
+    
+    scaler = model_data.get('scaler')
+    if scaler is not None:
+        arrays['scaler_mean'] = np.asarray(scaler.mean_, dtype='<f8')
+        arrays['scaler_scale'] = np.asarray(scaler.scale_, dtype='<f8')
+    if model_data.get('ratings_X') is not None:
+        arrays['ratings_X'] = np.asarray(model_data['ratings_X'], dtype='<f8')
+        arrays['ratings_y'] = np.asarray(model_data['ratings_y'], dtype='<i8')
+    
+    # Everything that is not the estimator or an array is plain metadata
+    skip = {'model', 'scaler', 'ratings_X', 'ratings_y'}
+    meta['data'] = {
+        key: (value.tolist() if isinstance(value, np.ndarray) else value)
+        for key, value in model_data.items() if key not in skip
+    }
+    
+    # Lay out arrays after the header, each 64-byte aligned. Offsets depend on
+    # the header length and vice versa, so iterate until the layout settles.
+    header = b''
+    while True:
+        manifest = {}
+        offset = _align(_PREAMBLE.size + len(header))
+        for name, array in arrays.items():
+            manifest[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset = _align(offset + array.nbytes)
+        encoded = json.dumps({'format': 'sapor-forest', 'meta': meta, 'arrays': manifest}).encode('utf-8')
+        encoded += b' ' * (_align(_PREAMBLE.size + len(encoded)) - _PREAMBLE.size - len(encoded))
+        settled = len(encoded) == len(header)
+        header = encoded
+        if settled:
+            break
+    
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(manifest[name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+def load_packed(path):
+    """
+    Load a packed model, memory-mapping its arrays
+    
+    Returns a dict shaped like the trainer's pickles: 'model' is a
+    PackedForest, 'scaler' a PackedScaler, plus the stored metadata.
+    """
+    with open(path, 'rb') as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed SAPOR model")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported packed model version {version} in {path}")
+        header = json.loads(f.read(header_len))
+    
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                     offset=spec['offset']).reshape(spec['shape'])
+    
+    meta = header['meta']
+    model_data = dict(meta['data'])
+    model_data['model'] = PackedForest(arrays, meta['classes'], meta['n_features'], meta['max_depth'])
+    if 'scaler_mean' in arrays:
+        model_data['scaler'] = PackedScaler(arrays['scaler_mean'], arrays['scaler_scale'])
+    for key in ('ratings_X', 'ratings_y'):
+        if key in arrays:
+            model_data[key] = arrays[key]
+    return model_data
+
+def convert(pickle_path, remove=False):
+    """Convert one trainer pickle to packed format; returns the new path"""
+    import joblib
+    packed_path = os.path.splitext(pickle_path)[0] + EXTENSION
+    save_packed(packed_path, joblib.load(pickle_path))
+    if remove:
+        os.remove(pickle_path)
+    return packed_path
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert trained model pickles to the packed format')
+    parser.add_argument('command', choices=['convert'])
+    parser.add_argument('--userId', help='Convert a single user')
+    parser.add_argument('--all', action='store_true', help='Convert every pickle in the models directory')
+    parser.add_argument('--remove', action='store_true', help='Delete each pickle after converting it')
+    args = parser.parse_args()
+    
+    from trainer import MODEL_DIR
+    
+    if args.all:
+        paths = sorted(
+            os.path.join(MODEL_DIR, name) for name in os.listdir(MODEL_DIR) if name.endswith('.pkl')
+        )
+    elif args.userId:
+        paths = [os.path.join(MODEL_DIR, f'{args.userId}.pkl')]
+    else:
+        parser.error('pass --userId or --all')
+    
+    failed = 0
+    for path in paths:
+        try:
+            print(f"✅ {convert(path, remove=args.remove)}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {path}: {str(e)}")
+    
+    print(f"\n🎉 Converted {len(paths) - failed}/{len(paths)} models")
+    sys.exit(1 if failed else 0)
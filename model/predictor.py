@@ -6,32 +6,329 @@ Loads a trained user model and predicts meal suitability scores
 
 Usage:
     python predictor.py --userId <id> --mealFeatures <features>
+    python predictor.py --userId <id> --matrix <meals.csv|meals.npy|-> [--topK <k>]
+    python predictor.py --pairs <pairs.jsonl|-> [--workers <n>]
+    python predictor.py --userId <id> --catalog [<path>] [--mealIds <id1,id2>] [--topK <k>]
+    python predictor.py --serve
 
 Example:
     python predictor.py --userId 123 --mealFeatures "1,0,1,0,0,0,0,1,1,0,0,0,0,0.2"
+    python predictor.py --userId 123 --matrix catalog.npy --topK 10
+
+Matrix mode scores every row (one meal per row) in a single predict_proba
+call and prints the top-k rows as JSON, best first.
+
+Pairs mode reads {"userId": ..., "mealFeatures": ...} JSON lines for any
+mix of users, loads each user's model once, scores each user's rows as one
+matrix (optionally across a process pool) and prints one result line per
+input line, in input order.
+
+Catalog mode scores meals by id against the precomputed catalog feature
+store (see catalog.py) - the whole catalog when no ids are given.
+
+Serve mode keeps the process (and every model it has loaded) alive and
+answers JSON-lines requests on stdin, one response line per request:
+    {"id": 1, "userId": "123", "mealFeatures": [1, 0, 1, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0.2]}
+    -> {"id": 1, "score": 0.8712}
+    {"id": 2, "op": "rank", "userId": "123", "mealFeatures": [[...], [...]], "topK": 5}
+    -> {"id": 2, "ranked": [{"index": 1, "score": 0.91}, ...]}
+    {"id": 3, "op": "rank_catalog", "userId": "123", "mealIds": ["m1", "m7"], "topK": 5}
+    -> {"id": 3, "ranked": [{"mealId": "m7", "score": 0.91}, ...]}
+
+Loaded models are kept in a size-bounded LRU cache that revalidates against
+the pickle's mtime/size, so models retrained by trainer.py are picked up
+without a restart. Limits come from SAPOR_MODEL_CACHE_SIZE (models) and
+SAPOR_MODEL_CACHE_BYTES (approximate bytes, on-disk size of each pickle).
+
+Models converted to the packed format (model_format.py, <userId>.sapor)
+are memory-mapped instead of unpickled and take precedence over pickles.
+
+Users trained with `trainer.py --mode shared` have no pickle of their own;
+they are scored by the shared model (see shared_model.py) conditioned on
+their stored preference vector.
 """
 
 import sys
 import os
+import io
+import json
 import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import joblib
 import numpy as np
 
+import shared_model
+import model_format
+from catalog import MealCatalog, DEFAULT_CATALOG
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Predict meal scores for user')
-    parser.add_argument('--userId', required=True, help='User ID')
-    parser.add_argument('--mealFeatures', required=True, help='Comma-separated meal features')
-    return parser.parse_args()
+    parser.add_argument('--userId', help='User ID')
+    parser.add_argument('--mealFeatures', help='Comma-separated meal features')
+    parser.add_argument('--matrix', help='CSV or .npy file of meal feature rows, or - for stdin')
+    parser.add_argument('--topK', type=int, default=None, help='Only return the k best rows')
+    parser.add_argument('--catalog', nargs='?', const=DEFAULT_CATALOG, default=None,
+                        help='Score meals from the catalog feature store (optionally at this path)')
+    parser.add_argument('--mealIds', help='Comma-separated catalog meal ids (default: whole catalog)')
+    parser.add_argument('--pairs', help='JSON-lines file of userId/mealFeatures pairs, or - for stdin')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Score users of a --pairs batch across this many processes')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a long-lived JSON-lines service on stdin/stdout')
+    args = parser.parse_args()
+    if not args.serve and args.pairs is None:
+        if args.userId is None:
+            parser.error('--userId is required unless --serve or --pairs is given')
+        if sum(x is not None for x in (args.mealFeatures, args.matrix, args.catalog)) != 1:
+            parser.error('exactly one of --mealFeatures, --matrix or --catalog is required')
+    return args
+
+def parse_features(raw):
+    """Accept either a comma-separated string or a list of numbers"""
+    if isinstance(raw, str):
+        return [float(x) for x in raw.split(',')]
+    return [float(x) for x in raw]
+
+class ModelCache:
+    """
+    LRU cache of loaded user models
+    
+    Entries are bounded both by count and by approximate size in bytes and
+    are revalidated against the file's (path, mtime, size) on every lookup,
+    so a retrained or converted model replaces the stale one on the next
+    request.
+    """
+    
+    def __init__(self, max_models=256, max_bytes=512 * 1024 * 1024):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # user_id -> (signature, nbytes, model_data)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+    
+    def get(self, user_id, path, loader):
+        """Return the model stored at path, loading it on a miss or after a file change"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            # Only forget the entry if it came from this (now deleted) file
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0][0] == path:
+                    self._remove(user_id)
+            raise
+        signature = (path, st.st_mtime_ns, st.st_size)
+        
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self.reloads += 1
+                self._remove(user_id)
+            self.misses += 1
+        
+        model_data = loader(path)
+        
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+            self._entries[user_id] = (signature, st.st_size, model_data)
+            self._bytes += st.st_size
+            self._evict()
+        return model_data
+    
+    def invalidate(self, user_id=None):
+        """Drop one user's model, or every model when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif user_id in self._entries:
+                self._remove(user_id)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'models': len(self._entries),
+                'bytes': self._bytes,
+                'max_models': self.max_models,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def _remove(self, user_id):
+        _, nbytes, _ = self._entries.pop(user_id)
+        self._bytes -= nbytes
+    
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models or self._bytes > self.max_bytes
+        ):
+            user_id = next(iter(self._entries))
+            self._remove(user_id)
+            self.evictions += 1
+
+model_cache = ModelCache(
+    max_models=int(os.environ.get('SAPOR_MODEL_CACHE_SIZE', 256)),
+    max_bytes=int(os.environ.get('SAPOR_MODEL_CACHE_BYTES', 512 * 1024 * 1024))
+)
+
+def read_matrix(source):
+    """
+    Read a 2-D meal feature matrix from a CSV or .npy file, or stdin ("-")
+    
+    Stdin may carry either format; .npy is recognised by its magic bytes.
+    """
+    if source == '-':
+        raw = sys.stdin.buffer.read()
+    else:
+        with open(source, 'rb') as f:
+            raw = f.read()
+    
+    if raw.startswith(b'\x93NUMPY'):
+        matrix = np.load(io.BytesIO(raw), allow_pickle=False)
+    else:
+        matrix = np.loadtxt(io.BytesIO(raw), delimiter=',', dtype=np.float64, ndmin=2)
+    
+    return np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+
+def _load_first(cache_key, base_path):
+    """Load base_path's packed variant if present, else its pickle"""
+    try:
+        return model_cache.get(cache_key, base_path + model_format.EXTENSION, model_format.load_packed)
+    except FileNotFoundError:
+        return model_cache.get(cache_key, base_path + '.pkl', joblib.load)
+
+def load_global_model():
+    """Load the shared model used for users trained in shared mode"""
+    base_path = os.path.splitext(shared_model.global_model_path(MODEL_DIR))[0]
+    try:
+        return _load_first('__shared_global__', base_path)['model']
+    except FileNotFoundError:
+        raise FileNotFoundError("Shared model not found - run shared_model.py") from None
+
+def _load_shared_user(path):
+    profile = shared_model.load_profile(path)
+    profile['model'] = shared_model.ConditionedModel(profile['user_prefs'], load_global_model)
+    return profile
+
+_catalogs = {}  # path -> (signature, catalog)
+
+def load_catalog(path=DEFAULT_CATALOG):
+    """
+    Memory-map a catalog once per process
+    
+    Like the model cache, the entry is revalidated against the file's
+    (mtime, size) on every call, so a rebuilt catalog is picked up by
+    serve-mode processes without a restart.
+    """
+    st = os.stat(f'{path}.npz')
+    signature = (st.st_mtime_ns, st.st_size)
+    entry = _catalogs.get(path)
+    if entry is None or entry[0] != signature:
+        entry = _catalogs[path] = (signature, MealCatalog.load(path))
+    return entry[1]
+
+def rank_catalog(user_id, meal_ids=None, top_k=None, path=DEFAULT_CATALOG):
+    """
+    Score catalog meals by id for one user, best first
+    
+    Returns:
+        list: [(meal_id, score), ...]
+    """
+    catalog = load_catalog(path)
+    if meal_ids is None:
+        ids = catalog.ids
+        scores = predict_scores(user_id, catalog.matrix)
+    else:
+        ids = [str(m) for m in meal_ids]
+        scores = predict_scores(user_id, catalog.features(ids))
+    return [(ids[row], score) for row, score in rank_meals(scores, top_k)]
 
 def load_model(user_id):
-    """Load the trained model for a user"""
-    model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
-    model_path = os.path.join(model_dir, f'{user_id}.pkl')
+    """
+    Load the trained model for a user (served from the model cache when fresh)
+    
+    A per-user model (packed, then pickle) takes precedence; otherwise a
+    shared-mode profile is wrapped around the shared model.
+    """
+    user_id = str(user_id)
+    
+    try:
+        return _load_first(user_id, os.path.join(MODEL_DIR, user_id))
+    except FileNotFoundError:
+        pass
     
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found for user {user_id}")
+    try:
+        return model_cache.get(f'shared:{user_id}', shared_model.profile_path(MODEL_DIR, user_id),
+                               _load_shared_user)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Model not found for user {user_id}") from None
+
+def score_matrix(model_data, feature_matrix):
+    """Score every row of a feature matrix against an already loaded model"""
+    model = model_data['model']
     
-    return joblib.load(model_path)
+    # Prepare features (float32 catalog rows are passed through without a copy)
+    features = np.asarray(feature_matrix)
+    if features.dtype.kind != 'f':
+        features = features.astype(np.float64)
+    features = np.atleast_2d(features)
+    
+    # Predict probability of liking, one tree pass for the whole matrix
+    proba = model.predict_proba(features)
+    return proba[:, list(model.classes_).index(1)]
+
+def predict_scores(user_id, feature_matrix):
+    """
+    Predict how much a user would like each meal in a matrix
+    
+    Args:
+        feature_matrix: (n_meals, n_features) array-like, one meal per row
+    
+    Returns:
+        np.ndarray: Probability scores (0-1), aligned with the input rows
+    """
+    return score_matrix(load_model(user_id), feature_matrix)
+
+def rank_meals(scores, top_k=None):
+    """
+    Order row indices by score, best first
+    
+    Uses argpartition so only the top_k rows are fully sorted. Ties keep
+    input order.
+    
+    Returns:
+        list: [(row_index, score), ...]
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if top_k is None or top_k >= n:
+        order = np.argsort(-scores, kind='stable')
+    elif top_k <= 0:
+        order = np.empty(0, dtype=np.intp)
+    else:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        # Sort by score, then by row index to keep ties deterministic
+        order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return [(int(i), float(scores[i])) for i in order]
 
 def predict_score(user_id, meal_features):
     """
@@ -40,25 +337,169 @@ def predict_score(user_id, meal_features):
     Returns:
         float: Probability score (0-1) of user liking the meal
     """
-    # Load model
-    model_data = load_model(user_id)
-    model = model_data['model']
-    scaler = model_data['scaler']
+    return float(predict_scores(user_id, [meal_features])[0])
+
+def _score_group(user_id, rows):
+    """Score one user's rows; returns (scores, None) or (None, error message)"""
+    try:
+        return predict_scores(user_id, rows), None
+    except Exception as e:
+        return None, str(e)
+
+def predict_pairs(pairs, workers=None):
+    """
+    Score (user_id, meal_features) pairs for many users at once
     
-    # Prepare features
-    features = np.array([meal_features])
+    Pairs are grouped by user so each model is loaded once and each user's
+    meals are scored as a single matrix. With workers > 1 the user groups
+    are spread over a process pool, each worker keeping its own model cache.
     
-    # Predict probability
-    prob = model.predict_proba(features)[0][1]  # Probability of liking
+    Returns:
+        tuple: (scores, errors) where scores is an np.ndarray aligned with
+        the input pairs (NaN where scoring failed) and errors maps user id
+        to the failure message
+    """
+    groups = OrderedDict()  # user_id -> (input positions, feature rows)
+    n_pairs = 0
+    for user_id, meal_features in pairs:
+        positions, rows = groups.setdefault(str(user_id), ([], []))
+        positions.append(n_pairs)
+        rows.append(meal_features)
+        n_pairs += 1
     
-    return prob
+    user_ids = list(groups)
+    matrices = [groups[u][1] for u in user_ids]
+    
+    if workers and workers > 1 and len(user_ids) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(user_ids) // (workers * 4))
+            results = list(pool.map(_score_group, user_ids, matrices, chunksize=chunksize))
+    else:
+        results = [_score_group(u, m) for u, m in zip(user_ids, matrices)]
+    
+    scores = np.full(n_pairs, np.nan)
+    errors = {}
+    for user_id, (group_scores, error) in zip(user_ids, results):
+        if error is not None:
+            errors[user_id] = error
+        else:
+            scores[groups[user_id][0]] = group_scores
+    
+    return scores, errors
+
+def iter_pairs(lines):
+    """Yield (user_id, meal_features) from JSON lines"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            record = json.loads(line)
+            yield str(record['userId']), parse_features(record['mealFeatures'])
+
+def format_pair_results(pairs, scores, errors):
+    """Build one result dict per input pair, in input order"""
+    results = []
+    for (user_id, _), score in zip(pairs, scores):
+        if user_id in errors:
+            results.append({'userId': user_id, 'error': errors[user_id]})
+        else:
+            results.append({'userId': user_id, 'score': round(float(score), 4)})
+    return results
+
+def handle_request(request):
+    """Answer a single serve-mode request"""
+    op = request.get('op', 'predict')
+    
+    if op == 'ping':
+        return {'ok': True, 'loaded': model_cache.stats()['models']}
+    
+    if op == 'stats':
+        return {'cache': model_cache.stats()}
+    
+    if op == 'unload':
+        model_cache.invalidate(str(request['userId']))
+        model_cache.invalidate(f"shared:{request['userId']}")
+        return {'ok': True}
+    
+    if op == 'rank':
+        matrix = [parse_features(row) for row in request['mealFeatures']]
+        scores = predict_scores(str(request['userId']), matrix)
+        ranked = rank_meals(scores, request.get('topK'))
+        return {'ranked': [{'index': i, 'score': round(score, 4)} for i, score in ranked]}
+    
+    if op == 'rank_catalog':
+        ranked = rank_catalog(str(request['userId']), request.get('mealIds'), request.get('topK'),
+                              request.get('catalog', DEFAULT_CATALOG))
+        return {'ranked': [{'mealId': m, 'score': round(score, 4)} for m, score in ranked]}
+    
+    if op == 'batch':
+        pairs = [(str(p['userId']), parse_features(p['mealFeatures'])) for p in request['pairs']]
+        scores, errors = predict_pairs(pairs)
+        return {'results': format_pair_results(pairs, scores, errors)}
+    
+    if op != 'predict':
+        raise ValueError(f"Unknown op: {op}")
+    
+    score = predict_score(str(request['userId']), parse_features(request['mealFeatures']))
+    return {'score': round(score, 4)}
+
+def serve(stream_in=sys.stdin, stream_out=sys.stdout):
+    """
+    Long-lived prediction service speaking JSON lines
+    
+    Each input line is one request; each gets exactly one response line
+    carrying the same "id". Failures are reported per request so one bad
+    line never takes the service down.
+    """
+    for line in stream_in:
+        line = line.strip()
+        if not line:
+            continue
+        
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = handle_request(request)
+        except Exception as e:
+            response = {'error': str(e)}
+        
+        response['id'] = request_id
+        stream_out.write(json.dumps(response) + '\n')
+        stream_out.flush()
 
 if __name__ == '__main__':
     try:
         args = parse_args()
         
+        if args.serve:
+            serve()
+            sys.exit(0)
+        
+        if args.pairs is not None:
+            if args.pairs == '-':
+                pairs = list(iter_pairs(sys.stdin))
+            else:
+                with open(args.pairs) as f:
+                    pairs = list(iter_pairs(f))
+            scores, errors = predict_pairs(pairs, workers=args.workers)
+            for result in format_pair_results(pairs, scores, errors):
+                print(json.dumps(result))
+            sys.exit(0)
+        
+        if args.catalog is not None:
+            meal_ids = args.mealIds.split(',') if args.mealIds else None
+            ranked = rank_catalog(args.userId, meal_ids, args.topK, args.catalog)
+            print(json.dumps([{'mealId': m, 'score': round(score, 4)} for m, score in ranked]))
+            sys.exit(0)
+        
+        if args.matrix is not None:
+            scores = predict_scores(args.userId, read_matrix(args.matrix))
+            ranked = rank_meals(scores, args.topK)
+            print(json.dumps([{'index': i, 'score': round(score, 4)} for i, score in ranked]))
+            sys.exit(0)
+        
         # Parse features
-        meal_features = [float(x) for x in args.mealFeatures.split(',')]
+        meal_features = parse_features(args.mealFeatures)
         
         # Predict
         score = predict_score(args.userId, meal_features)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+SAPOR Shared Model
+
+Alternative to one RandomForest pickle per user: a single global model is
+trained on (user preferences, meal features) pairs, and each user only
+stores their 14-dim encoded preference vector as a small JSON profile.
+
+Layout on disk (inside models/):
+    _shared_global.pkl     the one shared model
+    <userId>.json          per-user profile, a few hundred bytes
+
+Usage:
+    python shared_model.py --users 300 --trees 100
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+
+GLOBAL_MODEL_FILE = '_shared_global.pkl'
+PROFILE_FORMAT = 'sapor-shared-v1'
+
+def global_model_path(model_dir):
+    return os.path.join(model_dir, GLOBAL_MODEL_FILE)
+
+def profile_path(model_dir, user_id):
+    return os.path.join(model_dir, f'{user_id}.json')
+
+def conditioned_features(user_prefs, meal_matrix):
+    """
+    Build the shared model's input: [user prefs, meal features, |meal - prefs|]
+    
+    The absolute difference makes "how close is this meal to what the user
+    asked for" directly visible to the trees instead of having to be
+    learned from interactions.
+    """
+    meals = np.atleast_2d(np.asarray(meal_matrix, dtype=np.float64))
+    prefs = np.broadcast_to(np.asarray(user_prefs, dtype=np.float64), meals.shape)
+    return np.hstack([prefs, meals, np.abs(meals - prefs)])
+
+def sample_preferences(rng, taste_options, mood_options):
+    """Draw a random, plausible user preference set"""
+    tastes = [t for t in taste_options if rng.random() < 0.3] or [str(rng.choice(taste_options))]
+    moods = [m for m in mood_options if rng.random() < 0.3]
+    carbon = str(rng.choice(['low', 'medium', 'high']))
+    return tastes, moods, carbon
+
+def train_global_model(model_dir, n_users=300, n_trees=100, max_depth=12, seed=42):
+    """
+    Train and save the shared model on synthetic data for sampled users
+    
+    Returns:
+        str: Path of the saved global model
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from trainer import encode_preferences, generate_synthetic_data, TASTE_OPTIONS, MOOD_OPTIONS
+    
+    rng = np.random.default_rng(seed)
+    X_parts, y_parts = [], []
+    for _ in range(n_users):
+        user_prefs = encode_preferences(*sample_preferences(rng, TASTE_OPTIONS, MOOD_OPTIONS))
+        X_user, y_user = generate_synthetic_data(user_prefs, rng=rng)
+        X_parts.append(conditioned_features(user_prefs, X_user))
+        y_parts.append(y_user)
+    
+    X_train = np.vstack(X_parts)
+    y_train = np.concatenate(y_parts)
+    print(f"🤖 Training shared model on {len(X_train)} examples from {n_users} sampled users")
+    
+    model = RandomForestClassifier(
+        n_estimators=n_trees,
+        max_depth=max_depth,
+        random_state=seed,
+        n_jobs=-1
+    )
+    model.fit(X_train, y_train)
+    
+    os.makedirs(model_dir, exist_ok=True)
+    path = global_model_path(model_dir)
+    joblib.dump({'model': model, 'n_users': n_users, 'format': PROFILE_FORMAT}, path)
+    
+    print(f"✅ Shared model saved to: {path}")
+    print(f"   Accuracy: {model.score(X_train, y_train):.2%}")
+    return path
+
+def save_profile(model_dir, user_id, user_prefs, tastes, moods, carbon_pref):
+    """Write a user's shared-mode profile; returns its path"""
+    os.makedirs(model_dir, exist_ok=True)
+    path = profile_path(model_dir, user_id)
+    profile = {
+        'format': PROFILE_FORMAT,
+        'user_prefs': [float(p) for p in user_prefs],
+        'tastes': tastes,
+        'moods': moods,
+        'carbon_pref': carbon_pref
+    }
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, path)
+    return path
+
+def load_profile(path):
+    with open(path) as f:
+        profile = json.load(f)
+    if profile.get('format') != PROFILE_FORMAT:
+        raise ValueError(f"Unsupported profile format in {path}: {profile.get('format')}")
+    return profile
+
+class ConditionedModel:
+    """
+    Per-user view of the shared model
+    
+    Exposes the predict_proba/classes_ interface of a per-user estimator so
+    callers do not need to know which model family is in use. The global
+    model is resolved through a loader on every call, so it can be cached
+    and reloaded independently of the user profiles.
+    """
+    
+    def __init__(self, user_prefs, global_loader):
+        self.user_prefs = np.asarray(user_prefs, dtype=np.float64)
+        self._global_loader = global_loader
+    
+    @property
+    def classes_(self):
+        return self._global_loader().classes_
+    
+    def predict_proba(self, meal_matrix):
+        return self._global_loader().predict_proba(conditioned_features(self.user_prefs, meal_matrix))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the shared SAPOR model')
+    parser.add_argument('--users', type=int, default=300, help='Number of synthetic users to sample')
+    parser.add_argument('--trees', type=int, default=100, help='Number of trees')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+    
+    from trainer import MODEL_DIR
+    train_global_model(MODEL_DIR, n_users=args.users, n_trees=args.trees, seed=args.seed)
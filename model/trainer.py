@@ -9,14 +9,33 @@ Trains a personalized recommendation model for each user based on:
 - Meal ratings history (if any)
 
 Usage:
-    python trainer.py --userId <id> --tastes <taste1,taste2> --moods <mood1,mood2> --carbon <low|medium|high>
+    python trainer.py --userId <id> --tastes <taste1,taste2> --moods <mood1,mood2> --carbon <low|medium|high> [--mode <per_user|shared>]
+    python trainer.py --userId <id> --ratings <ratings.jsonl|->
 
 Example:
     python trainer.py --userId 123 --tastes spicy,sweet --moods cozy,energetic --carbon low
+
+Modes:
+    per_user  (default) fit a RandomForest for this user -> models/<userId>.pkl
+    shared    store only the encoded preferences -> models/<userId>.json, scored
+              by the shared model trained with shared_model.py
+
+Formats (per_user mode):
+    pkl       (default) joblib pickle, the only format rating updates can extend
+    sapor     packed, memory-mapped serving format (see model_format.py)
+
+Ratings update an existing per-user model incrementally instead of
+refitting it: a handful of new trees are grown (warm start) on the user's
+rating history plus a small synthetic prior, and the oldest trees are
+retired once the forest reaches its size cap. Each line of the ratings
+file is one event, e.g.
+    {"mealFeatures": [1, 0, 1, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 0.2], "rating": 5}
+Ratings of 4 or more count as liked (an explicit "liked" flag also works).
 """
 
 import sys
 import os
+import json
 import argparse
 import joblib
 import numpy as np
@@ -28,89 +47,107 @@ warnings.filterwarnings('ignore')
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import shared_model
+import model_format
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+
+# Common tastes and moods, in feature-vector order
+TASTE_OPTIONS = ['spicy', 'sweet', 'savory', 'sour', 'bitter', 'umami', 'salty']
+MOOD_OPTIONS = ['cozy', 'energetic', 'relaxed', 'focused', 'social', 'adventurous']
+
+# Incremental updates
+LIKED_RATING = 4            # ratings at or above this count as liked
+TREES_PER_UPDATE = 5        # trees grown per update
+MAX_TREES = 200             # oldest trees are retired beyond this
+MAX_RATING_HISTORY = 1000   # most recent rating events kept per user
+RATING_WEIGHT = 3.0         # sample weight of a real rating vs a synthetic example
+
 def parse_args():
     parser = argparse.ArgumentParser(description='Train user recommendation model')
     parser.add_argument('--userId', required=True, help='User ID')
-    parser.add_argument('--tastes', required=True, help='Comma-separated taste preferences')
-    parser.add_argument('--moods', required=True, help='Comma-separated mood preferences')
-    parser.add_argument('--carbon', required=True, choices=['low', 'medium', 'high'], help='Carbon preference')
-    return parser.parse_args()
+    parser.add_argument('--tastes', help='Comma-separated taste preferences')
+    parser.add_argument('--moods', help='Comma-separated mood preferences')
+    parser.add_argument('--carbon', choices=['low', 'medium', 'high'], help='Carbon preference')
+    parser.add_argument('--ratings', help='JSON-lines rating events to fold into the existing model, or - for stdin')
+    parser.add_argument('--mode', default='per_user', choices=['per_user', 'shared'],
+                        help='Train a per-user forest or store a profile for the shared model')
+    parser.add_argument('--format', default='pkl', choices=['pkl', 'sapor'],
+                        help='On-disk format for per-user models')
+    parser.add_argument('--samples', type=int, default=100, help='Number of synthetic training examples')
+    parser.add_argument('--positiveRatio', type=float, default=0.6,
+                        help='Fraction of synthetic examples labelled as liked')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for synthetic data')
+    args = parser.parse_args()
+    if args.ratings is None and (args.tastes is None or args.moods is None or args.carbon is None):
+        parser.error('--tastes, --moods and --carbon are required unless --ratings is given')
+    return args
 
 def encode_preferences(tastes, moods, carbon_pref):
     """
     Encode user preferences into feature vector
     """
     # Taste encoding (common tastes)
-    taste_options = ['spicy', 'sweet', 'savory', 'sour', 'bitter', 'umami', 'salty']
-    taste_vector = [1 if taste in tastes else 0 for taste in taste_options]
+    taste_vector = [1 if taste in tastes else 0 for taste in TASTE_OPTIONS]
     
     # Mood encoding (common moods)
-    mood_options = ['cozy', 'energetic', 'relaxed', 'focused', 'social', 'adventurous']
-    mood_vector = [1 if mood in moods else 0 for mood in mood_options]
+    mood_vector = [1 if mood in moods else 0 for mood in MOOD_OPTIONS]
     
     # Carbon preference encoding
     carbon_score = {'low': 0.0, 'medium': 0.5, 'high': 1.0}[carbon_pref]
     
     return taste_vector + mood_vector + [carbon_score]
 
-def generate_synthetic_data(user_prefs):
+def generate_synthetic_data(user_prefs, n_samples=100, positive_ratio=0.6, rng=None):
     """
     Generate synthetic training data based on user preferences
     
     Since new users don't have rating history, we create synthetic
-    positive and negative examples based on their stated preferences
-    """
-    n_samples = 100
-    n_features = len(user_prefs)
+    positive and negative examples based on their stated preferences:
+    positives are the preferences plus small noise, negatives flip every
+    binary preference (non-binary ones are drawn uniformly) plus larger
+    noise. Everything is generated as whole matrices.
     
-    X_train = []
-    y_train = []
+    Args:
+        n_samples: Total number of examples
+        positive_ratio: Fraction of examples labelled as liked
+        rng: np.random.Generator or seed; a fresh generator when None
+    """
+    rng = np.random.default_rng(rng)
+    prefs = np.asarray(user_prefs, dtype=np.float64)
+    n_features = len(prefs)
+    n_pos = int(round(n_samples * positive_ratio))
+    n_neg = n_samples - n_pos
     
     # Generate positive examples (meals user would like)
-    for _ in range(60):
-        # Start with user preferences
-        features = user_prefs.copy()
-        # Add some random noise
-        noise = np.random.normal(0, 0.1, len(features))
-        features = [max(0, min(1, f + n)) for f, n in zip(features, noise)]
-        X_train.append(features)
-        y_train.append(1)  # Like
-    
-    # Generate negative examples (meals user wouldn't like)
-    for _ in range(40):
-        # Opposite of preferences
-        features = [1 - p if p in [0, 1] else np.random.random() for p in user_prefs]
-        # Add noise
-        noise = np.random.normal(0, 0.2, len(features))
-        features = [max(0, min(1, f + n)) for f, n in zip(features, noise)]
-        X_train.append(features)
-        y_train.append(0)  # Dislike
-    
-    return np.array(X_train), np.array(y_train)
-
-def train_model(user_id, tastes, moods, carbon_pref):
-    """
-    Train and save user's personalized model
-    """
-    print(f"🤖 Training model for user: {user_id}")
-    print(f"   Tastes: {', '.join(tastes)}")
-    print(f"   Moods: {', '.join(moods)}")
-    print(f"   Carbon: {carbon_pref}")
+    positives = prefs + rng.normal(0, 0.1, (n_pos, n_features))
     
-    # Encode preferences
-    user_prefs = encode_preferences(tastes, moods, carbon_pref)
-    print(f"   Encoded {len(user_prefs)} features")
+    # Generate negative examples (opposite of preferences)
+    binary = (prefs == 0) | (prefs == 1)
+    negatives = np.where(binary, 1 - prefs, rng.random((n_neg, n_features)))
+    negatives += rng.normal(0, 0.2, (n_neg, n_features))
     
+    X_train = np.clip(np.vstack([positives, negatives]), 0, 1)
+    y_train = np.concatenate([np.ones(n_pos, dtype=int), np.zeros(n_neg, dtype=int)])
+    
+    return X_train, y_train
+
+def fit_user_model(user_prefs, n_samples=100, positive_ratio=0.6, seed=None, n_jobs=-1):
+    """
+    Fit a user's forest and scaler on synthetic data
+    
+    Returns:
+        tuple: (model, scaler, training accuracy)
+    """
     # Generate training data
-    X_train, y_train = generate_synthetic_data(user_prefs)
-    print(f"   Generated {len(X_train)} training examples")
+    X_train, y_train = generate_synthetic_data(user_prefs, n_samples, positive_ratio, rng=seed)
     
     # Create and train model
     model = RandomForestClassifier(
         n_estimators=50,
         max_depth=10,
         random_state=42,
-        n_jobs=-1
+        n_jobs=n_jobs
     )
     
     model.fit(X_train, y_train)
@@ -119,10 +156,55 @@ def train_model(user_id, tastes, moods, carbon_pref):
     scaler = StandardScaler()
     scaler.fit(X_train)
     
-    # Save model and metadata
-    model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
-    os.makedirs(model_dir, exist_ok=True)
+    return model, scaler, model.score(X_train, y_train)
+
+def save_model_data(user_id, model_data, fmt='pkl'):
+    """
+    Write a user's model atomically
+    
+    The file is written to a temporary file in the models directory and
+    renamed into place, so a concurrently running predictor never sees a
+    half-written model. Copies in the other format are removed.
+    """
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    pickle_path = os.path.join(MODEL_DIR, f'{user_id}.pkl')
+    packed_path = os.path.join(MODEL_DIR, f'{user_id}{model_format.EXTENSION}')
+    
+    if fmt == 'sapor':
+        model_path = model_format.save_packed(packed_path, model_data)
+        _remove_if_exists(pickle_path)
+    else:
+        model_path = pickle_path
+        tmp_path = f'{model_path}.{os.getpid()}.tmp'
+        try:
+            joblib.dump(model_data, tmp_path)
+            os.replace(tmp_path, model_path)
+        finally:
+            _remove_if_exists(tmp_path)
+        _remove_if_exists(packed_path)
+    
+    _remove_if_exists(shared_model.profile_path(MODEL_DIR, user_id))
+    return model_path
+
+def train_model(user_id, tastes, moods, carbon_pref, n_samples=100, positive_ratio=0.6, seed=None,
+                n_jobs=-1, verbose=True, fmt='pkl'):
+    """
+    Train and save user's personalized model
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log(f"🤖 Training model for user: {user_id}")
+    log(f"   Tastes: {', '.join(tastes)}")
+    log(f"   Moods: {', '.join(moods)}")
+    log(f"   Carbon: {carbon_pref}")
     
+    # Encode preferences
+    user_prefs = encode_preferences(tastes, moods, carbon_pref)
+    log(f"   Encoded {len(user_prefs)} features")
+    
+    model, scaler, accuracy = fit_user_model(user_prefs, n_samples, positive_ratio, seed, n_jobs)
+    log(f"   Trained on {n_samples} synthetic examples")
+    
+    # Save model and metadata
     model_data = {
         'model': model,
         'scaler': scaler,
@@ -132,18 +214,139 @@ def train_model(user_id, tastes, moods, carbon_pref):
         'carbon_pref': carbon_pref
     }
     
-    model_path = os.path.join(model_dir, f'{user_id}.pkl')
-    joblib.dump(model_data, model_path)
+    model_path = save_model_data(user_id, model_data, fmt)
     
-    print(f"✅ Model trained and saved to: {model_path}")
-    print(f"   Accuracy: {model.score(X_train, y_train):.2%}")
+    log(f"✅ Model trained and saved to: {model_path}")
+    log(f"   Accuracy: {accuracy:.2%}")
     
     return model_path
 
+def parse_rating(event):
+    """Turn one rating event into (meal_features, label)"""
+    features = event['mealFeatures']
+    if isinstance(features, str):
+        features = features.split(',')
+    features = [float(x) for x in features]
+    if 'liked' in event:
+        label = 1 if event['liked'] else 0
+    else:
+        label = 1 if float(event['rating']) >= LIKED_RATING else 0
+    return features, label
+
+def update_model(user_id, ratings, trees_per_update=TREES_PER_UPDATE, max_trees=MAX_TREES,
+                 seed=None, n_jobs=1, verbose=True):
+    """
+    Fold new rating events into a user's existing model
+    
+    Rather than refitting the whole forest, `trees_per_update` trees are
+    added with warm_start, fitted on the user's rating history (weighted
+    by RATING_WEIGHT) plus a small synthetic prior from their stated
+    preferences. Trees beyond `max_trees` are retired oldest first, so the
+    forest drifts towards real feedback while its size stays bounded.
+    
+    Args:
+        ratings: Iterable of rating events (see parse_rating)
+    
+    Returns:
+        str: Path of the updated model
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    model_path = os.path.join(MODEL_DIR, f'{user_id}.pkl')
+    if not os.path.exists(model_path):
+        if os.path.exists(os.path.join(MODEL_DIR, f'{user_id}{model_format.EXTENSION}')):
+            raise ValueError(f"User {user_id} has a packed (read-only) model; retrain as pkl to apply ratings")
+        if os.path.exists(shared_model.profile_path(MODEL_DIR, user_id)):
+            raise ValueError(f"User {user_id} uses the shared model; rating updates need a per-user model")
+        raise FileNotFoundError(f"Model not found for user {user_id}")
+    
+    parsed = [parse_rating(event) for event in ratings]
+    if not parsed:
+        raise ValueError("No rating events given")
+    
+    model_data = joblib.load(model_path)
+    model = model_data['model']
+    
+    # Append to the stored rating history
+    new_X = np.array([features for features, _ in parsed], dtype=np.float64)
+    new_y = np.array([label for _, label in parsed], dtype=int)
+    history_X = model_data.get('ratings_X')
+    history_y = model_data.get('ratings_y')
+    if history_X is not None:
+        new_X = np.vstack([history_X, new_X])
+        new_y = np.concatenate([history_y, new_y])
+    model_data['ratings_X'] = new_X[-MAX_RATING_HISTORY:]
+    model_data['ratings_y'] = new_y[-MAX_RATING_HISTORY:]
+    
+    # Real ratings on top of a synthetic prior, so both classes are present
+    X_prior, y_prior = generate_synthetic_data(model_data['user_prefs'], rng=seed)
+    X_train = np.vstack([X_prior, model_data['ratings_X']])
+    y_train = np.concatenate([y_prior, model_data['ratings_y']])
+    weights = np.concatenate([
+        np.ones(len(y_prior)),
+        np.full(len(model_data['ratings_y']), RATING_WEIGHT)
+    ])
+    
+    # Grow a few new trees on top of the existing ones. warm_start seeds new
+    # trees by skipping len(estimators_) draws, which repeats once the forest
+    # is trimmed to max_trees, so each update gets its own seed
+    updates = model_data.get('updates', 0) + 1
+    model_data['updates'] = updates
+    rng = np.random.default_rng(None if seed is None else [seed, updates])
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees_per_update, n_jobs=n_jobs,
+                     random_state=int(rng.integers(2**31)))
+    model.fit(X_train, y_train, sample_weight=weights)
+    
+    # Retire the oldest trees once over budget
+    if len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    
+    model_path = save_model_data(user_id, model_data)
+    log(f"✅ Folded {len(parsed)} ratings into model for user {user_id} "
+        f"({len(model.estimators_)} trees, {len(model_data['ratings_y'])} ratings in history)")
+    return model_path
+
+def save_shared_profile(user_id, tastes, moods, carbon_pref, verbose=True):
+    """
+    Register a user with the shared model
+    
+    Nothing is fitted here: the user's encoded preferences are all the
+    shared model needs, so this costs a few hundred bytes on disk.
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log(f"🤖 Saving shared-model profile for user: {user_id}")
+    user_prefs = encode_preferences(tastes, moods, carbon_pref)
+    
+    profile_path = shared_model.save_profile(MODEL_DIR, user_id, user_prefs, tastes, moods, carbon_pref)
+    _remove_if_exists(os.path.join(MODEL_DIR, f'{user_id}.pkl'))
+    _remove_if_exists(os.path.join(MODEL_DIR, f'{user_id}{model_format.EXTENSION}'))
+    
+    if not os.path.exists(shared_model.global_model_path(MODEL_DIR)):
+        log("⚠️  Shared model not trained yet - run shared_model.py before scoring")
+    
+    log(f"✅ Profile saved to: {profile_path}")
+    return profile_path
+
+def _remove_if_exists(path):
+    """Drop a user's model in another mode/format so the predictor never serves a stale one"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
 if __name__ == '__main__':
     try:
         args = parse_args()
         
+        if args.ratings is not None:
+            if args.ratings == '-':
+                events = [json.loads(line) for line in sys.stdin if line.strip()]
+            else:
+                with open(args.ratings) as f:
+                    events = [json.loads(line) for line in f if line.strip()]
+            update_model(args.userId, events, seed=args.seed)
+            sys.exit(0)
+        
         # Parse tastes and moods
         tastes = [t.strip().lower() for t in args.tastes.split(',') if t.strip()]
         moods = [m.strip().lower() for m in args.moods.split(',') if m.strip()]
@@ -153,12 +356,24 @@ if __name__ == '__main__':
             sys.exit(1)
         
         # Train model
-        model_path = train_model(
-            user_id=args.userId,
-            tastes=tastes,
-            moods=moods if moods else [],
-            carbon_pref=args.carbon
-        )
+        if args.mode == 'shared':
+            model_path = save_shared_profile(
+                user_id=args.userId,
+                tastes=tastes,
+                moods=moods if moods else [],
+                carbon_pref=args.carbon
+            )
+        else:
+            model_path = train_model(
+                user_id=args.userId,
+                tastes=tastes,
+                moods=moods if moods else [],
+                carbon_pref=args.carbon,
+                n_samples=args.samples,
+                positive_ratio=args.positiveRatio,
+                seed=args.seed,
+                fmt=args.format
+            )
         
         print(f"\n🎉 Training complete!")
         sys.exit(0)
@@ -0,0 +1,108 @@
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from agent.meal_catalog import MealCatalog, DEFAULT_CATALOG_PATH
+
+# Minimum trigram Jaccard similarity for a name to count as a catalog meal
+MIN_SIMILARITY = 0.5
+# Memoized lookups per distinct normalized name
+MATCH_CACHE_SIZE = 65536
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, with runs of punctuation and whitespace collapsed to one space."""
+    return _NON_ALNUM.sub(" ", name.lower()).strip()
+
+
+def trigrams(name: str) -> List[str]:
+    """Distinct character trigrams of a normalized name, padded at both ends of the name."""
+    padded = f"  {name} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class MealNameIndex:
+    """
+    Trigram index over catalog meal names for fuzzy lookup.
+
+    Postings are kept in CSR layout (gram_indptr, gram_meals) over a trigram
+    vocabulary. A lookup concatenates the postings of the query's trigrams
+    and counts them per meal with one bincount, which gives the shared
+    trigram count for every meal at once; the best Jaccard similarity wins.
+    Results are memoized per normalized name, and completions within a
+    training run repeat names heavily.
+    """
+
+    def __init__(self, catalog: MealCatalog, min_similarity: float = MIN_SIMILARITY):
+        self.catalog = catalog
+        self.min_similarity = min_similarity
+        self.vocab: Dict[str, int] = {}
+        postings: List[List[int]] = []
+        gram_counts = np.zeros(len(catalog), dtype=np.int32)
+
+        for pos, name in enumerate(catalog.names):
+            grams = trigrams(normalize_name(name))
+            gram_counts[pos] = len(grams)
+            for gram in grams:
+                gram_id = self.vocab.setdefault(gram, len(postings))
+                if gram_id == len(postings):
+                    postings.append([])
+                postings[gram_id].append(pos)
+
+        self.gram_indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.gram_indptr[1:] = np.cumsum([len(p) for p in postings])
+        self.gram_meals = np.fromiter((pos for p in postings for pos in p), dtype=np.int32,
+                                      count=int(self.gram_indptr[-1]))
+        self.gram_counts = gram_counts
+        self._cache: Dict[str, Tuple[int, float]] = {}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH, **kwargs) -> "MealNameIndex":
+        return cls(MealCatalog.load(path), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def match(self, name: str) -> Tuple[int, float]:
+        """
+        (position, similarity) of the closest catalog meal.
+
+        Position is -1 when no meal reaches min_similarity.
+        """
+        key = normalize_name(name)
+        hit = self._cache.get(key)
+        if hit is not None:
+            return hit
+
+        result = self._match(key)
+        if len(self._cache) >= MATCH_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def match_many(self, names: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions (-1 when unmatched) and similarities for a batch of names."""
+        positions = np.full(len(names), -1, dtype=np.int64)
+        similarity = np.zeros(len(names), dtype=np.float64)
+        for i, name in enumerate(names):
+            positions[i], similarity[i] = self.match(name)
+        return positions, similarity
+
+    def _match(self, key: str) -> Tuple[int, float]:
+        if not key:
+            return -1, 0.0
+        grams = trigrams(key)
+        indptr = self.gram_indptr
+        ids = [self.vocab[g] for g in grams if g in self.vocab]
+        postings = [self.gram_meals[indptr[i]:indptr[i + 1]] for i in ids]
+        if not postings:
+            return -1, 0.0
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.catalog))
+        similarity = shared / (len(grams) + self.gram_counts - shared)
+        best = int(np.argmax(similarity))
+        score = float(similarity[best])
+        return (best if score >= self.min_similarity else -1), score
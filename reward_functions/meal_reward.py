@@ -1,76 +1,360 @@
+import os
 import re
-from typing import Optional, List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple, Union
+import numpy as np
 import torch
 
+from agent.constraint_parser import parse_constraints
+from reward_functions.catalog_index import MealNameIndex
+
+RECOMMENDATION = "**Recommendation:**"
+CALORIES = "**Calories:**"
+PROTEIN = "**Protein:**"
+BUDGET = "**Budget:**"
+
+# Batches at least this large are scored in the process pool (when enabled)
+PARALLEL_THRESHOLD = 8192
+
+# Share of the reward given to meeting the prompt's constraints, when it has any
+ADHERENCE_WEIGHT = 0.5
+# Calorie deviation (fraction of the target) at which calorie credit reaches 0
+CALORIE_TOLERANCE = 0.5
+# Share of the reward given to agreeing with the catalog, when one is loaded
+CATALOG_WEIGHT = 0.3
+# Mean relative deviation from catalog nutrition/price at which credit reaches 0
+CATALOG_TOLERANCE = 0.5
+# Distinct prompts whose parsed constraints are kept
+PROMPT_CACHE_SIZE = 4096
+
+# Meal-name words that break a diet, matched as whole words (plurals included)
+NON_VEGETARIAN = ("chicken", "beef", "pork", "bacon", "ham", "hamburger", "cheeseburger", "turkey",
+                  "lamb", "veal", "duck", "steak", "sausage", "meat", "meatball", "pepperoni", "chorizo", "prosciutto",
+                  "fish", "salmon", "tuna", "cod", "shrimp", "prawn", "crab", "lobster", "anchovy",
+                  "anchovies", "clam", "mussel", "oyster", "scallop", "gelatin")
+NON_VEGAN = NON_VEGETARIAN + ("egg", "cheese", "yogurt", "yoghurt", "milk", "butter",
+                              "cream", "honey", "whey", "paneer", "feta", "parmesan", "mozzarella", "ghee")
+
+# Plant-based phrases that contain a banned word but fit the diet; removed
+# from the meal name before the diet check
+_PLANT_BASED = re.compile(
+    r"\b(?:almond|oat|soy|coconut|rice|cashew|hemp)\s+(?:milk|cream|yogh?urt|cheese|butter)\b"
+    r"|\b(?:peanut|almond|cashew|nut|seed|apple|cocoa|shea)\s+butter\b"
+    r"|\b(?:vegan|veggie|plant[- ]based|meatless)\s+\w+"
+)
+
+
+def _word_pattern(words: Tuple[str, ...]) -> "re.Pattern":
+    return re.compile(r"\b(?:" + "|".join(sorted(map(re.escape, words), key=len, reverse=True)) + r")(?:e?s)?\b")
+
+
+_NON_VEGETARIAN = _word_pattern(NON_VEGETARIAN)
+_NON_VEGAN = _word_pattern(NON_VEGAN)
+
+Message = Dict[str, str]
+
+
+# Anchored field grammars, matched in place right after each marker
+_SPACE = re.compile(r"\s*")
+_NUMBER = re.compile(r"\s*(\d+)")
+_GRAMS = re.compile(r"\s*(\d+)g")
+_PRICE = re.compile(r"\s*\$([0-9.]+)")
+# The layout the model is trained to emit: fields on consecutive lines
+_CANONICAL = re.compile(
+    r"\*\*Recommendation:\*\*\s*([^\n]+)\n"
+    r"\s*\*\*Calories:\*\*\s*(\d+)"
+    r"\s*\*\*Protein:\*\*\s*(\d+)g"
+    r"\s*\*\*Budget:\*\*\s*\$([0-9.]+)"
+)
+
+
+def _find_field(text: str, marker: str, field: "re.Pattern", pos: int) -> Optional["re.Match"]:
+    """First `marker` at or after pos that is directly followed by field."""
+    at = text.find(marker, pos)
+    while at >= 0:
+        match = field.match(text, at + len(marker))
+        if match:
+            return match
+        at = text.find(marker, at + 1)
+    return None
+
+
+def _parse_fields(text: str, pos: int) -> Optional[Tuple[str, str, str]]:
+    calories = _find_field(text, CALORIES, _NUMBER, pos)
+    if calories is None:
+        return None
+    protein = _find_field(text, PROTEIN, _GRAMS, calories.end(1))
+    if protein is None:
+        return None
+    budget = _find_field(text, BUDGET, _PRICE, protein.end())
+    if budget is None:
+        return None
+    return calories.group(1), protein.group(1), budget.group(1)
+
+
+def parse_completion(text: str) -> Optional[Tuple[str, str, str, str]]:
+    """
+    Extract (meal, calories, protein, budget) strings from a completion.
+    
+    Same result as searching with MealRewardFunction.PATTERN, but markers
+    are located with str.find and each field is matched anchored right
+    after its marker, so malformed completions cost linear time instead of
+    the pattern's lazy DOTALL backtracking. Only the first
+    Recommendation marker can start a match: any later one sees a subset
+    of the text after it.
+    """
+    at = text.find(RECOMMENDATION)
+    if at < 0:
+        return None
+    head = at + len(RECOMMENDATION)
+    name_start = _SPACE.match(text, head).end()
+    # Well-formed completions match in one anchored pass. Fields separated
+    # only by whitespace are necessarily the first valid ones, so this agrees
+    # with the scan below as long as the name starts where greedy \s* ends
+    match = _CANONICAL.match(text, at)
+    if match and match.start(1) == name_start:
+        return match.groups()
+    # \s* is greedy, so the meal name starts after the whitespace; give
+    # whitespace back to the name only if that fails
+    fields_from = None
+    for start in range(name_start, head - 1, -1):
+        newline = text.find("\n", start + 1)
+        if newline < 0:
+            continue
+        if newline != fields_from:
+            fields_from = newline
+            fields = _parse_fields(text, newline + 1)
+        if fields is not None:
+            return (text[start:newline],) + fields
+    return None
+
+
+def _text(value: Union[str, List[Message]], roles: Tuple[str, ...]) -> str:
+    """Plain text of a prompt or completion, which may be a list of chat messages."""
+    if isinstance(value, str):
+        return value
+    return "\n".join(m.get("content", "") for m in value if m.get("role") in roles)
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def prompt_constraints(prompt: str) -> Tuple[float, float, Optional[str]]:
+    """(max_budget, calorie_target, diet_type) asked for in a prompt; NaN when absent."""
+    constraints = parse_constraints(prompt)
+    return (
+        constraints["max_budget"] if constraints["max_budget"] else np.nan,
+        constraints["calorie_target"] if constraints["calorie_target"] else np.nan,
+        constraints["diet_type"]
+    )
+
+
+def _breaks_diet(meal: str, diet_type: Optional[str]) -> bool:
+    if diet_type is None:
+        return False
+    meal = _PLANT_BASED.sub(" ", meal.lower())
+    banned = _NON_VEGAN if diet_type == "vegan" else _NON_VEGETARIAN
+    return banned.search(meal) is not None
+
+
+# Scorer of a pool worker process, set once by _init_worker so the catalog
+# index is shipped to each worker once and its match cache persists
+_worker_scorer: Optional["MealRewardFunction"] = None
+
+
+def _init_worker(scorer: "MealRewardFunction") -> None:
+    global _worker_scorer
+    _worker_scorer = scorer
+
+
+def _score_chunk(prompts: List[Any], completions: List[Any]) -> List[float]:
+    return _worker_scorer._score_batch(prompts, completions).tolist()
+
+
 class MealRewardFunction:
     """Custom reward function for SAPOR meal planning GRPO training."""
     
-    def __init__(self):
-        self.pattern = re.compile(
-            r"\*\*Recommendation:\*\*\s*(.+?)\n.*?"
-            r"\*\*Calories:\*\*\s*(\d+).*?"
-            r"\*\*Protein:\*\*\s*(\d+)g.*?"
-            r"\*\*Budget:\*\*\s*\$([0-9.]+)",
-            re.DOTALL
-        )
+    # Reference grammar for completions; parse_completion implements it
+    PATTERN = re.compile(
+        r"\*\*Recommendation:\*\*\s*(.+?)\n.*?"
+        r"\*\*Calories:\*\*\s*(\d+).*?"
+        r"\*\*Protein:\*\*\s*(\d+)g.*?"
+        r"\*\*Budget:\*\*\s*\$([0-9.]+)",
+        re.DOTALL
+    )
+    
+    def __init__(self, workers: int = 0, parallel_threshold: int = PARALLEL_THRESHOLD,
+                 catalog_index: Optional[MealNameIndex] = None):
+        """
+        Args:
+            workers: Processes for scoring large batches (0 scores in-process)
+            parallel_threshold: Minimum batch size that goes to the pool
+            catalog_index: Known meals to check recommendations against
+        """
+        self.pattern = self.PATTERN
+        self.catalog_index = catalog_index
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
     
     def __call__(
         self,
-        prompts: List[str],
-        completions: List[str],
+        prompts: List[Union[str, List[Message]]],
+        completions: List[Union[str, List[Message]]],
         **kwargs
-    ) -> List[float]:
+    ) -> torch.Tensor:
         """
         Calculate rewards for meal recommendations.
         
+        Each completion gets a format/plausibility reward. When its prompt
+        states a budget, calorie target or diet, half the reward instead
+        comes from meeting them: full budget credit at or under the budget,
+        calorie credit falling off linearly with deviation from the target,
+        and no diet credit if the meal name names a food the diet excludes.
+        
+        With a catalog index, a further share checks for hallucinations: the
+        meal must fuzzy-match a catalog meal, and credit falls off as its
+        calories, protein and price deviate from the catalog entry.
+        
         Args:
-            prompts: List of prompts
-            completions: List of model completions
+            prompts: List of prompts (strings or chat messages)
+            completions: List of model completions (strings or chat messages)
             **kwargs: Additional metadata (diet, budget, etc.)
         
         Returns:
-            List of reward scores (0.0-1.0)
+            Tensor of reward scores (0.0-1.0)
         """
-        rewards = []
-        
-        for completion, prompt in zip(completions, prompts):
-            reward = self._calculate_reward(completion, prompt)
-            rewards.append(reward)
+        n = min(len(prompts), len(completions))
         
-        return torch.tensor(rewards, dtype=torch.float32)
+        if self.workers > 1 and n >= self.parallel_threshold:
+            return torch.tensor(self._score_parallel(prompts[:n], completions[:n]), dtype=torch.float32)
+        return self._score_batch(prompts[:n], completions[:n])
     
-    def _calculate_reward(self, completion: str, prompt: str) -> float:
-        """Calculate single reward score."""
-        match = self.pattern.search(completion)
+    def _score_batch(self, prompts: List[Any], completions: List[Any]) -> torch.Tensor:
+        n = len(completions)
+        parsed = np.zeros(n, dtype=bool)      # completion has the expected format
+        numeric = np.zeros(n, dtype=bool)     # and its fields are valid numbers
+        values = np.zeros((n, 3))             # calories, protein, budget
+        limits = np.full((n, 2), np.nan)      # max budget, calorie target
+        diet_ok = np.ones(n)
+        has_diet = np.zeros(n, dtype=bool)
+        meals = [""] * n
         
-        if not match:
-            return 0.0  # No valid format = 0 reward
+        for i, (prompt, completion) in enumerate(zip(prompts, completions)):
+            fields = parse_completion(_text(completion, ("assistant",)))
+            if fields is None:
+                continue
+            parsed[i] = True
+            meal, calories, protein, budget = fields
+            meals[i] = meal
+            try:
+                values[i] = (int(calories), int(protein), float(budget))
+                numeric[i] = True
+            except ValueError:
+                continue
+            
+            # Repeated prompts (num_generations per prompt) hit the cache
+            max_budget, calorie_target, diet_type = prompt_constraints(_text(prompt, ("user",)))
+            limits[i] = (max_budget, calorie_target)
+            if diet_type is not None:
+                has_diet[i] = True
+                diet_ok[i] = 0.0 if _breaks_diet(meal, diet_type) else 1.0
         
-        meal, calories, protein, budget = match.groups()
+        catalog_score = self._catalog_score(meals, numeric, values) if self.catalog_index is not None else None
         
-        # Base reward for valid format
-        reward = 0.3
+        # Everything below is float64 until the final cast
+        values = torch.from_numpy(values)
+        limits = torch.from_numpy(limits)
+        numeric_t = torch.from_numpy(numeric)
+        calories, protein, budget = values.unbind(1)
+        zeros = torch.zeros(n, dtype=torch.float64)
         
-        try:
-            calories = int(calories)
-            protein = int(protein)
-            budget = float(budget)
-            
-            # Reward for reasonable nutritional values
-            if 200 <= calories <= 1000:
-                reward += 0.2
-            if 5 <= protein <= 100:
-                reward += 0.2
-            if budget > 0:
-                reward += 0.3
-            
-            # Check if meal name is reasonable (not gibberish)
-            if len(meal.split()) <= 5 and meal.isascii():
-                reward += 0.0  # Already counted in format reward
-        except (ValueError, IndexError):
-            return 0.3  # Partial reward for valid format
+        # Format and plausible ranges (0.3 for the format alone)
+        base = 0.3 + numeric_t.double() * (
+            0.2 * ((calories >= 200) & (calories <= 1000)).double()
+            + 0.2 * ((protein >= 5) & (protein <= 100)).double()
+            + 0.3 * (budget > 0).double()
+        )
+        base = torch.where(torch.from_numpy(parsed), base, zeros)
         
-        return min(reward, 1.0)
+        # Adherence to whichever constraints the prompt states
+        max_budget, calorie_target = limits.unbind(1)
+        has_budget = ~torch.isnan(max_budget)
+        has_calories = ~torch.isnan(calorie_target)
+        has_diet_t = torch.from_numpy(has_diet)
+        budget_score = (1 - (budget - max_budget).clamp(min=0) / max_budget).clamp(0, 1)
+        calorie_score = (1 - (calories - calorie_target).abs() / (calorie_target * CALORIE_TOLERANCE)).clamp(0, 1)
+        stated = has_budget.double() + has_calories.double() + has_diet_t.double()
+        adherence = (
+            torch.where(has_budget, budget_score, zeros)
+            + torch.where(has_calories, calorie_score, zeros)
+            + torch.where(has_diet_t, torch.from_numpy(diet_ok), zeros)
+        ) / stated.clamp(min=1)
+        
+        constrained = numeric_t & (stated > 0)
+        rewards = torch.where(constrained, (1 - ADHERENCE_WEIGHT) * base + ADHERENCE_WEIGHT * adherence, base)
+        
+        if catalog_score is not None:
+            catalog_score = torch.from_numpy(catalog_score)
+            rewards = torch.where(numeric_t, (1 - CATALOG_WEIGHT) * rewards + CATALOG_WEIGHT * catalog_score, rewards)
+        return rewards.clamp(max=1.0).to(torch.float32)
+    
+    def _catalog_score(self, meals: List[str], numeric: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Per-completion agreement with the catalog: 0 for unknown meals."""
+        positions = np.full(len(meals), -1, dtype=np.int64)
+        rows = np.flatnonzero(numeric)
+        positions[rows] = self.catalog_index.match_many([meals[i] for i in rows])[0]
+        
+        found = positions >= 0
+        catalog = self.catalog_index.catalog
+        known = positions[found]
+        expected = np.column_stack((catalog.calories[known], catalog.protein[known], catalog.budget[known])).astype(np.float64)
+        deviation = np.abs(values[found] - expected) / np.maximum(expected, 1e-6)
+        
+        score = np.zeros(len(meals))
+        score[found] = np.clip(1 - deviation.mean(axis=1) / CATALOG_TOLERANCE, 0, 1)
+        return score
+    
+    def _score_parallel(self, prompts: List[Any], completions: List[Any]) -> List[float]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self,))
+        chunk = -(-len(completions) // (self.workers * 4))
+        starts = range(0, len(completions), chunk)
+        parts = self._pool.map(
+            _score_chunk,
+            [prompts[i:i + chunk] for i in starts],
+            [completions[i:i + chunk] for i in starts]
+        )
+        rewards = []
+        for part in parts:
+            rewards.extend(part)
+        return rewards
+    
+    def __getstate__(self):
+        # Workers get the scoring configuration (once, at pool start), not the pool
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+    
+    def close(self):
+        """Shut down the scoring pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def _calculate_reward(self, completion: str, prompt: str) -> float:
+        """Calculate single reward score."""
+        return float(self._score_batch([prompt], [completion])[0])
+
+
+# Shared scorer, reused across trainer steps. SAPOR_REWARD_WORKERS enables the
+# pool; SAPOR_REWARD_CATALOG names a catalog to verify meals against, indexed
+# once per training run
+_CATALOG_PATH = os.environ.get("SAPOR_REWARD_CATALOG")
+_DEFAULT_SCORER = MealRewardFunction(
+    workers=int(os.environ.get("SAPOR_REWARD_WORKERS", 0)),
+    catalog_index=MealNameIndex.load(_CATALOG_PATH) if _CATALOG_PATH else None
+)
 
 
 # Export reward function for Oumi
@@ -80,5 +364,4 @@ def meal_correctness(
     **kwargs
 ) -> torch.Tensor:
     """Oumi-compatible reward function interface."""
-    reward_fn = MealRewardFunction()
-    return reward_fn(prompts, completions, **kwargs)
+    return _DEFAULT_SCORER(prompts, completions, **kwargs)